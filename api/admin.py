@@ -1,9 +1,10 @@
 from django.contrib import admin
-from .models import Transaction, PettyCash, Bill, Sale, CalendarEvent
+from .models import Transaction, PettyCash, Bill, Sale, CalendarEvent, RecurrenceRule
 
 # Register your models here.
 admin.site.register(Transaction)
 admin.site.register(PettyCash)
 admin.site.register(Bill)
 admin.site.register(Sale)
-admin.site.register(CalendarEvent)
\ No newline at end of file
+admin.site.register(CalendarEvent)
+admin.site.register(RecurrenceRule)
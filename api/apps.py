@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .authentication import connect_signals as connect_auth_signals
+        from .cache import connect_signals
+        from .db import configure_sqlite
+        connect_signals()
+        connect_auth_signals()
+        connection_created.connect(configure_sqlite, dispatch_uid='api_configure_sqlite')
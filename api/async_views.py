@@ -0,0 +1,170 @@
+"""
+ASGI-native versions of the read-only dashboard endpoints, mounted under
+``/api/async/``. They return the same payloads as the ViewSet actions but
+query through Django's async ORM, so under an ASGI server a fan-out of
+dashboard calls is served from the event loop instead of a thread each.
+"""
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.timezone import localtime
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from .authentication import CachedCookieJWTAuthentication
+from .metrics import timed
+from .models import DailyRollup
+from .pagination import KeysetPagination
+from .permissions import owner_queryset
+from .renderers import dumps
+from .utils.events import day_span, overlapping
+from .utils.totals import (
+    arollup_totals, atransaction_totals, day_param, summary_response, summary_windows,
+)
+from .views import BillViewSet, CalendarEventViewSet, PettyCashViewSet, SaleViewSet, TransactionViewSet
+
+_authenticator = CachedCookieJWTAuthentication()
+
+
+def async_api_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+        try:
+            # Token checks may reload the blacklist snapshot and read the user's privileges, so
+            # they run off the event loop, on the thread (and connection) the async ORM uses.
+            result = await sync_to_async(_authenticator.authenticate)(request)
+        except APIException as exc:
+            return JsonResponse({"detail": str(exc.detail)}, status=exc.status_code)
+        if result is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        api_request = Request(request)
+        api_request.user = result[0]
+        try:
+            data = await view(api_request, *args, **kwargs)
+        except APIException as exc:
+            return JsonResponse(exc.detail, status=exc.status_code, safe=False)
+        return HttpResponse(dumps(data), content_type='application/json')
+    return wrapper
+
+
+def _use_rollups():
+    return getattr(settings, 'LEDGER_ROLLUPS_ENABLED', True)
+
+
+async def _totals(request, windows):
+    if _use_rollups():
+        rollups = DailyRollup.objects.filter(source=TransactionViewSet.rollup_source)
+        return await arollup_totals(owner_queryset(rollups, request.user), windows)
+    return await atransaction_totals(owner_queryset(TransactionViewSet.queryset, request.user), windows)
+
+
+async def _total_amount(request, viewset, row_filters=None, rollup_filters=None):
+    if _use_rollups():
+        queryset = DailyRollup.objects.filter(source=viewset.rollup_source, **(rollup_filters or {}))
+        field = 'total'
+    else:
+        queryset, field = viewset.queryset.filter(**(row_filters or {})), 'amount'
+    queryset = owner_queryset(queryset, request.user)
+    return (await queryset.aaggregate(total=Sum(field)))['total'] or 0
+
+
+async def _page(request, viewset, queryset):
+    queryset = owner_queryset(queryset, request.user)
+    paginator = KeysetPagination()
+    rows = await paginator.apaginate_queryset(queryset, request, viewset)
+    with timed('serialize'):
+        data = viewset.serializer_class(rows, many=True).data
+    return paginator.get_paginated_data(data)
+
+
+@async_api_view
+async def me_view(request):
+    user = request.user
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "is_superuser": user.is_superuser,
+        "is_staff": user.is_staff,
+    }
+
+
+@async_api_view
+async def transaction_summary(request):
+    local_today = localtime(timezone.now()).date()
+    return summary_response(await _totals(request, summary_windows(request.query_params, local_today)))
+
+
+@async_api_view
+async def today_total_transactions(request):
+    today = day_param(request.query_params.get("today"), localtime(timezone.now()).date())
+    return (await _totals(request, {"today": (today, today)}))["today"]
+
+
+@async_api_view
+async def yesterday_total_transactions(request):
+    yesterday = (localtime(timezone.now()) - timedelta(days=1)).date()
+    return (await _totals(request, {"yesterday": (yesterday, yesterday)}))["yesterday"]
+
+
+@async_api_view
+async def todays_transactions(request):
+    local_today = localtime(timezone.now()).date()
+    return await _page(request, TransactionViewSet, TransactionViewSet.queryset.filter(date=local_today))
+
+
+@async_api_view
+async def total_sales(request):
+    return {"total_sales": await _total_amount(request, SaleViewSet)}
+
+
+@async_api_view
+async def todays_sales(request):
+    local_today = localtime(timezone.now()).date()
+    return await _page(request, SaleViewSet, SaleViewSet.queryset.filter(sale_date=local_today))
+
+
+@async_api_view
+async def total_bills(request):
+    return {"total_bills": await _total_amount(request, BillViewSet)}
+
+
+@async_api_view
+async def total_paid_bills(request):
+    return {"total_paid_bills": await _total_amount(request, BillViewSet, {"is_paid": True}, {"kind": 'paid'})}
+
+
+@async_api_view
+async def total_unpaid_bills(request):
+    return {"total_unpaid_bills": await _total_amount(request, BillViewSet, {"is_paid": False}, {"kind": 'unpaid'})}
+
+
+@async_api_view
+async def todays_bills(request):
+    local_today = localtime(timezone.now()).date()
+    return await _page(request, BillViewSet, BillViewSet.queryset.filter(due_date=local_today))
+
+
+@async_api_view
+async def total_petty_cash(request):
+    return {"total_petty_cash": await _total_amount(request, PettyCashViewSet, {"isApproved": True}, {"kind": 'approved'})}
+
+
+@async_api_view
+async def todays_petty_cash(request):
+    local_today = localtime(timezone.now()).date()
+    return await _page(request, PettyCashViewSet, PettyCashViewSet.queryset.filter(date=local_today))
+
+
+@async_api_view
+async def todays_events(request):
+    local_today = localtime(timezone.now()).date()
+    events = CalendarEventViewSet.queryset.filter(overlapping(*day_span(local_today)))
+    return await _page(request, CalendarEventViewSet, events)
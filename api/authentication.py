@@ -1,4 +1,26 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+# Claims copied from the user into every token, so requests can be served without loading the row.
+USER_CLAIMS = ('username', 'email', 'is_staff', 'is_superuser')
+# Flags that grant access; read from user_privileges() on every request, never trusted from a token.
+PRIVILEGE_FIELDS = ('is_active', 'is_staff', 'is_superuser')
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -7,3 +29,214 @@ class CookieJWTAuthentication(JWTAuthentication):
             # Inject it into the header so the parent method can process it
             request.META['HTTP_AUTHORIZATION'] = f'Bearer {access_token}'
         return super().authenticate(request)
+
+
+def tokens_for_user(user):
+    refresh = RefreshToken.for_user(user)
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
+
+
+class _UserCache:
+    """Short-lived in-process cache of user rows for tokens issued without user claims."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def get(self, user_id, load):
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is None or entry[0] <= now:
+            entry = (now + ttl, load(user_id))
+            with self._lock:
+                self._users[user_id] = entry
+        return copy.copy(entry[1])
+
+    def discard(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+class _BlacklistSnapshot:
+    """
+    In-memory set of the blacklisted JTIs of tokens that have not expired yet.
+    The first check loads them; later refreshes, at most every
+    ``AUTH_BLACKLIST_REFRESH_SECONDS``, read only the rows added since by
+    primary key, so other workers' revocations arrive within that interval
+    at the cost of one small indexed query. Expired entries are dropped, as
+    an expired token fails validation anyway.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expiry = {}
+        self._last_id = None
+        self._loaded_at = None
+
+    def __contains__(self, jti):
+        interval = getattr(settings, 'AUTH_BLACKLIST_REFRESH_SECONDS', 5)
+        now = time.monotonic()
+        with self._lock:
+            stale = self._loaded_at is None or now - self._loaded_at >= interval
+        if stale:
+            self.refresh()
+        with self._lock:
+            return jti in self._expiry
+
+    def refresh(self):
+        loaded_at = time.monotonic()
+        with self._lock:
+            last_id = self._last_id
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        if last_id is not None:
+            # Ids are assigned under SQLite's write lock, so they become visible in order.
+            rows = rows.filter(id__gt=last_id)
+        rows = list(rows.order_by('id').values_list('id', 'token__jti', 'token__expires_at'))
+        now = timezone.now()
+        with self._lock:
+            for row_id, jti, expires_at in rows:
+                self._expiry[jti] = expires_at
+                self._last_id = max(row_id, self._last_id or 0)
+            if self._last_id is None:
+                self._last_id = 0
+            self._expiry = {jti: expires_at for jti, expires_at in self._expiry.items() if expires_at > now}
+            self._loaded_at = loaded_at
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+    def clear(self):
+        with self._lock:
+            self._expiry, self._last_id, self._loaded_at = {}, None, None
+
+
+user_cache = _UserCache()
+blacklist = _BlacklistSnapshot()
+
+
+def _privileges_key(user_id):
+    return f"auth:privileges:{user_id}"
+
+
+def user_privileges(user_id):
+    """
+    ``PRIVILEGE_FIELDS`` of the user, or None once the user is deleted. Kept
+    in the default cache for ``AUTH_USER_CACHE_TTL`` seconds and dropped when
+    the user is saved, so a deactivated or demoted user loses access at once
+    rather than when their token expires.
+    """
+    key = _privileges_key(user_id)
+    privileges = caches['default'].get(key)
+    if privileges is None:
+        row = (
+            get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values_list(*PRIVILEGE_FIELDS).first()
+        )
+        privileges = tuple(row) if row else ()
+        caches['default'].set(key, privileges, getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+    return privileges or None
+
+
+def _forget_user(sender, instance, **kwargs):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+
+    def forget():
+        caches['default'].delete(_privileges_key(user_id))
+        user_cache.discard(user_id)
+
+    # After commit, so a concurrent request cannot cache the row as it was before the save.
+    transaction.on_commit(forget)
+
+
+def connect_signals():
+    user_model = get_user_model()
+    post_save.connect(_forget_user, sender=user_model, dispatch_uid='auth_forget_user_save')
+    post_delete.connect(_forget_user, sender=user_model, dispatch_uid='auth_forget_user_delete')
+
+
+def revoke_token(token):
+    """
+    Blacklist ``token`` in the database, access tokens included (simplejwt
+    only blacklists refresh tokens), so every worker's ``blacklist`` picks
+    it up; this worker rejects it at once.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime_from_epoch(token['exp'])
+    outstanding, _ = OutstandingToken.objects.get_or_create(
+        jti=jti,
+        defaults={
+            "user_id": token.get(api_settings.USER_ID_CLAIM),
+            "created_at": token.current_time,
+            "token": str(token),
+            "expires_at": expires_at,
+        },
+    )
+    BlacklistedToken.objects.get_or_create(token=outstanding)
+    blacklist.add(jti, expires_at)
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in blacklist:
+            raise TokenError("Token is blacklisted")
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedBlacklistRefreshToken
+
+
+class CachedCookieJWTAuthentication(CookieJWTAuthentication):
+    """
+    Cookie JWT authentication that does not query the database per request.
+    Tokens carrying the user claims are turned into an unsaved ``User``
+    built from those claims; older tokens fall back to ``user_cache``.
+    Either way the privilege flags come from ``user_privileges``, not the
+    token. Access tokens revoked at logout are rejected through ``blacklist``.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti and jti in blacklist:
+            raise InvalidToken("Token is blacklisted")
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        if all(claim in validated_token for claim in USER_CLAIMS):
+            user = self.user_from_claims(user_id, validated_token)
+        else:
+            user = user_cache.get(user_id, self.load_user)
+        privileges = user_privileges(user_id)
+        if user is None or privileges is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        for field, value in zip(PRIVILEGE_FIELDS, privileges):
+            setattr(user, field, value)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
+
+    def load_user(self, user_id):
+        return self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+
+    def user_from_claims(self, user_id, validated_token):
+        # A real (unsaved) model instance, so ownership checks and FK filters behave as with a loaded row.
+        user = get_user_model()(**{api_settings.USER_ID_FIELD: user_id})
+        for claim in USER_CLAIMS:
+            setattr(user, claim, validated_token[claim])
+        user._state.adding = False
+        user._state.db = 'default'
+        return user
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'AGGREGATE_CACHE_ALIAS', 'default')]
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _version_key(model_name, scope):
+    return f"aggregate-version:{model_name}:{scope}"
+
+
+def data_version(model_name, scope='*'):
+    """Timestamp of the last write that can affect aggregates over ``model_name`` within ``scope``."""
+    cache = _cache()
+    key = _version_key(model_name, scope)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        # add() keeps a concurrent invalidation from being overwritten.
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate_aggregates(model_name, user_ids=()):
+    """
+    Bumps the data versions once the current transaction commits. Bumping
+    earlier would let a concurrent reader cache totals from before the
+    commit under the new version.
+    """
+    keys = [_version_key(model_name, '*')]
+    keys += [_version_key(model_name, user_id) for user_id in set(user_ids)]
+
+    def bump():
+        now = time.time()
+        _cache().set_many({key: now for key in keys}, timeout=None)
+        _count("invalidations")
+
+    transaction.on_commit(bump)
+
+
+def cached_aggregate(view_method):
+    """
+    Caches an aggregate action's response per user, query string and local
+    date. Entries are keyed on the data version of the view's model, which
+    the post_save/post_delete receivers below bump, so a write is visible
+    on the next request. Responses carry an ETag, and a GET whose
+    If-None-Match matches it is answered with 304. There is no
+    Last-Modified: a second-resolution date cannot tell apart two writes in
+    the same second, or today's totals from yesterday's.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        model_name = self.get_queryset().model._meta.model_name
+        scope = self.get_cache_scope() if hasattr(self, 'get_cache_scope') else '*'
+        version = data_version(model_name, scope)
+
+        params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.items()))
+        # Day-relative actions (today, yesterday, summary windows) change at midnight without a write.
+        today = timezone.localdate()
+        fingerprint = f"{request.path}?{params}|{request.user.pk}|{today}|{version}"
+        digest = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+        etag = quote_etag(digest)
+
+        if _not_modified(request, etag):
+            _count("not_modified")
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache = _cache()
+            cache_key = f"aggregate:{model_name}:{today}:{digest}"
+            data = cache.get(cache_key)
+            if data is None:
+                _count("misses")
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(cache_key, response.data, getattr(settings, 'AGGREGATE_CACHE_TIMEOUT', 300))
+                response['X-Cache'] = 'MISS'
+            else:
+                _count("hits")
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is None:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+def _invalidate_on_write(sender, instance, **kwargs):
+    invalidate_aggregates(sender._meta.model_name, [instance.user_id] if instance.user_id else [])
+
+
+def connect_signals():
+    from .models import Bill, PettyCash, Sale, Transaction
+
+    for model in (Transaction, Sale, Bill, PettyCash):
+        post_save.connect(_invalidate_on_write, sender=model, dispatch_uid=f'aggregate_cache_save_{model.__name__}')
+        post_delete.connect(_invalidate_on_write, sender=model, dispatch_uid=f'aggregate_cache_delete_{model.__name__}')
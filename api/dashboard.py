@@ -0,0 +1,152 @@
+"""
+``/api/dashboard/`` returns every home-screen widget in one response.
+
+With the daily rollups enabled all aggregate widgets come from a single
+conditional-aggregate query over ``DailyRollup``; otherwise it is one query
+per model. List widgets are one bounded query each. ``?widgets=`` limits
+the response to the named widgets and ``?limit=`` sizes the lists.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.timezone import localtime
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .metrics import timed
+from .models import Bill, DailyRollup, PettyCash, Sale, Transaction
+from .permissions import owner_queryset
+from .utils.events import day_span, overlapping
+from .utils.totals import ZERO, ROLLUP_FIELDS, summary_windows, totals_aggregates, totals_result
+from .views import BillViewSet, CalendarEventViewSet, PettyCashViewSet, SaleViewSet, TransactionViewSet
+
+TOTALS_WIDGETS = ('summary', 'today_total_transactions', 'yesterday_total_transactions')
+
+# widget: (rollup condition, model, row condition)
+AMOUNT_WIDGETS = {
+    'total_sales': (Q(source='sale'), Sale, Q()),
+    'total_bills': (Q(source='bill'), Bill, Q()),
+    'total_paid_bills': (Q(source='bill', kind='paid'), Bill, Q(is_paid=True)),
+    'total_unpaid_bills': (Q(source='bill', kind='unpaid'), Bill, Q(is_paid=False)),
+    'total_petty_cash': (Q(source='petty_cash', kind='approved'), PettyCash, Q(isApproved=True)),
+}
+
+# widget: (viewset, filter built from the local date)
+LIST_WIDGETS = {
+    'todays_transactions': (TransactionViewSet, lambda today: Q(date=today)),
+    'todays_sales': (SaleViewSet, lambda today: Q(sale_date=today)),
+    'todays_bills': (BillViewSet, lambda today: Q(due_date=today)),
+    'pending_bills': (BillViewSet, lambda today: Q(is_paid=False)),
+    'todays_petty_cash': (PettyCashViewSet, lambda today: Q(date=today)),
+    'pending_petty_cash': (PettyCashViewSet, lambda today: Q(isApproved=False)),
+    'todays_events': (CalendarEventViewSet, lambda today: overlapping(*day_span(today))),
+}
+
+WIDGETS = TOTALS_WIDGETS + tuple(AMOUNT_WIDGETS) + tuple(LIST_WIDGETS)
+
+
+def _requested_widgets(params):
+    selector = params.get('widgets')
+    if not selector:
+        return list(WIDGETS)
+    widgets = [name.strip() for name in selector.split(',') if name.strip()]
+    unknown = sorted(set(widgets) - set(WIDGETS))
+    if unknown:
+        raise ValidationError({"widgets": f"Unknown widgets: {', '.join(unknown)}."})
+    return widgets
+
+
+def _totals_windows(widgets, params, today):
+    windows = {}
+    if 'summary' in widgets:
+        windows["range"] = summary_windows(params, today)["range"]
+    if 'today_total_transactions' in widgets:
+        windows["today"] = (today, today)
+    if 'yesterday_total_transactions' in widgets:
+        yesterday = today - timedelta(days=1)
+        windows["yesterday"] = (yesterday, yesterday)
+    return windows
+
+
+def _widget_totals(totals):
+    data = {}
+    for window, widget in (("range", 'summary'), ("today", 'today_total_transactions'),
+                           ("yesterday", 'yesterday_total_transactions')):
+        if window in totals:
+            data[widget] = totals[window]
+    return data
+
+
+def _rollup_aggregates(user, widgets, windows):
+    """All aggregate widgets in one query over the rollup table."""
+    conditions, aggregates = totals_aggregates(windows, scope=Q(source='transaction'), **ROLLUP_FIELDS)
+    amounts = [name for name in widgets if name in AMOUNT_WIDGETS]
+    for name in amounts:
+        aggregates[name] = Coalesce(Sum('total', filter=AMOUNT_WIDGETS[name][0]), ZERO)
+    if not aggregates:
+        return {}
+
+    row = owner_queryset(DailyRollup.objects.all(), user).aggregate(**aggregates)
+    data = _widget_totals(totals_result(windows, row))
+    data.update({name: row[name] for name in amounts})
+    return data
+
+
+def _row_aggregates(user, widgets, windows):
+    """Aggregate widgets from the raw tables, one query per model."""
+    data = {}
+    if windows:
+        conditions, aggregates = totals_aggregates(windows)
+        row = owner_queryset(Transaction.objects.all(), user).aggregate(**aggregates)
+        data.update(_widget_totals(totals_result(windows, row)))
+
+    per_model = defaultdict(dict)
+    for name in widgets:
+        if name in AMOUNT_WIDGETS:
+            _, model, condition = AMOUNT_WIDGETS[name]
+            per_model[model][name] = Coalesce(Sum('amount', filter=condition or None), ZERO)
+    for model, aggregates in per_model.items():
+        data.update(owner_queryset(model.objects.all(), user).aggregate(**aggregates))
+    return data
+
+
+def _list_widgets(request, widgets, today, limit):
+    data = {}
+    for name in widgets:
+        if name not in LIST_WIDGETS:
+            continue
+        viewset, condition = LIST_WIDGETS[name]
+        queryset = owner_queryset(viewset.queryset, request.user).filter(condition(today))
+        ordering = viewset.keyset_ordering
+        prefix = '-' if ordering.startswith('-') else ''
+        rows = list(queryset.order_by(ordering, f'{prefix}id')[:limit])
+        with timed('serialize'):
+            data[name] = viewset.serializer_class(rows, many=True, context={"request": request}).data
+    return data
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def dashboard_view(request):
+    widgets = _requested_widgets(request.query_params)
+    today = localtime(timezone.now()).date()
+    rest = getattr(settings, 'REST_FRAMEWORK', {})
+    try:
+        limit = int(request.query_params.get('limit', getattr(settings, 'DASHBOARD_LIST_LIMIT', 10)))
+    except ValueError:
+        raise ValidationError({"limit": "Must be an integer."})
+    limit = max(1, min(limit, rest.get('MAX_PAGE_SIZE', 1000)))
+
+    windows = _totals_windows(widgets, request.query_params, today)
+    if getattr(settings, 'LEDGER_ROLLUPS_ENABLED', True):
+        data = _rollup_aggregates(request.user, widgets, windows)
+    else:
+        data = _row_aggregates(request.user, widgets, windows)
+    data.update(_list_widgets(request, widgets, today, limit))
+    return Response({name: data[name] for name in widgets})
@@ -0,0 +1,139 @@
+"""
+Database plumbing for deployments.
+
+``configure_sqlite`` runs on ``connection_created`` and applies
+``SQLITE_PRAGMAS`` to every new SQLite connection; with ``CONN_MAX_AGE``
+that happens once per worker connection, not once per request.
+
+``ReplicaRouter`` and ``ReplicaRoutingMiddleware`` send the reads of
+safe-method requests to the aliases in ``DATABASE_REPLICAS``. Writes,
+reads inside a transaction and the ``PRIMARY_ONLY_APPS`` tables stay on
+``default``. After a write the client gets a short-lived pin cookie, and
+its reads go to ``default`` until the replicas have caught up
+(``REPLICA_PIN_SECONDS``). A view opts out with ``use_read_replica = False``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'replica_pin'
+# Token revocation must be seen at once by every worker.
+PRIMARY_ONLY_APPS = frozenset({'token_blacklist'})
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+class _Routing:
+    """Per-request read alias; mutated in place so thread hops under ASGI still see it."""
+
+    def __init__(self, alias=None):
+        self.alias = alias
+
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+@contextmanager
+def use_replica(alias=None):
+    """Route this block's reads to ``alias`` (a random replica when None)."""
+    routing = _Routing(alias or random.choice(replica_aliases()))
+    token = _routing.set(routing)
+    try:
+        yield routing.alias
+    finally:
+        _routing.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        routing = _routing.get()
+        if routing is None or routing.alias is None:
+            return None
+        # A read inside a write transaction must see that transaction's rows.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema from the primary.
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _routing.set(_Routing())
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _routing.set(_Routing())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _routing.get()
+        if routing is None or request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            return None
+        view_class = getattr(view_func, 'cls', None)
+        if getattr(view_class, 'use_read_replica', getattr(view_func, 'use_read_replica', True)):
+            routing.alias = random.choice(replica_aliases())
+        return None
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, secure=True, samesite='None',
+            )
+        return response
@@ -0,0 +1,93 @@
+"""
+Bank statement import. Rows streamed from ``api.utils.statements`` are
+validated with ``TransactionSerializer`` in chunks and each chunk is written
+with one ``bulk_create`` in its own transaction. A row is skipped when the
+owner already had a transaction with the same ``content_hash`` (date,
+signed amount, title) before the import started, so re-importing an
+overlapping statement only adds the new rows. Each earlier row absorbs one
+matching row of the file: two identical payments in a statement are both
+imported the first time and both skipped the next.
+"""
+from django.db import transaction
+from django.db.models import Count, Max
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate_aggregates
+from .models import DailyRollup, Transaction
+from .serializers import TransactionSerializer
+from .utils.statements import StatementError, statement_rows
+
+CHUNK_SIZE = 2000
+# Error details kept in the report; every error is still counted.
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.skipped = 0
+        self.errored = 0
+        self.errors = []
+
+    def error(self, line, detail):
+        self.errored += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": detail})
+
+    def as_dict(self):
+        return {"inserted": self.inserted, "skipped": self.skipped, "errored": self.errored, "errors": self.errors}
+
+
+def import_statement(stream, statement_format, user, chunk_size=CHUNK_SIZE, context=None):
+    """Import a CSV or OFX statement for ``user``; returns an ``ImportReport``."""
+    serializer = TransactionSerializer(context=context or {})
+    report = ImportReport()
+    # Rows written by this import must not count as duplicates of the file's later rows.
+    last_pk = Transaction.objects.aggregate(last=Max('pk'))['last'] or 0
+    # content_hash -> earlier rows with that hash not yet matched by a row of the file.
+    unmatched = {}
+    chunk = []
+    for line, row in statement_rows(stream, statement_format):
+        if isinstance(row, StatementError):
+            report.error(line, [str(row)])
+            continue
+        row.setdefault('category', 'other')
+        try:
+            data = serializer.run_validation(row)
+        except ValidationError as exc:
+            report.error(line, exc.detail)
+            continue
+        data.pop('user', None)
+        chunk.append(Transaction(user=user, **data))
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, report, last_pk, unmatched)
+            chunk = []
+    if chunk:
+        _write_chunk(chunk, report, last_pk, unmatched)
+    if report.inserted:
+        invalidate_aggregates(Transaction._meta.model_name, [user.pk])
+    return report
+
+
+def _write_chunk(instances, report, last_pk, unmatched):
+    for instance in instances:
+        instance.content_hash = instance.compute_content_hash()
+    with transaction.atomic():
+        # Hashes matched in earlier chunks keep their remaining count in unmatched.
+        lookup = {i.content_hash for i in instances} - unmatched.keys()
+        unmatched.update(
+            Transaction.objects.filter(user=instances[0].user, pk__lte=last_pk, content_hash__in=lookup)
+            .values_list('content_hash').annotate(count=Count('pk')).order_by()
+        )
+        new = []
+        for instance in instances:
+            if unmatched.get(instance.content_hash):
+                unmatched[instance.content_hash] -= 1
+                report.skipped += 1
+                continue
+            new.append(instance)
+        if new:
+            Transaction.objects.bulk_create(new)
+            # bulk_create sends no post_save, so the rollups are updated here.
+            DailyRollup.apply_instances(new)
+    report.inserted += len(new)
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+from api.serializers import TransactionSerializer
+from api.utils.fast_serializers import FastListSerializer
+
+from .bench_serializers import synthetic_transactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Render a list-response payload with DRF's JSONRenderer and with FastJSONRenderer "
+        "and report milliseconds per MB of output for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Rows in the rendered list.")
+        parser.add_argument('--repeat', type=int, default=5, help="Renders per renderer; the best run is kept.")
+
+    def handle(self, *args, **options):
+        fast_list = FastListSerializer.build(TransactionSerializer())
+        # The values() rows the fast path would read for the same instances.
+        rows = [
+            {column: getattr(instance, column) for column in fast_list.columns}
+            for instance in synthetic_transactions(options['rows'])
+        ]
+        payload = {
+            "next": None,
+            "previous": None,
+            "results": fast_list.serialize(rows),
+            # Aggregates reach the renderer as raw Decimals and datetimes.
+            "totals": [{"day": row["date"], "total": row["amount"] * 3, "at": row["created_at"]} for row in rows],
+        }
+
+        expected = renderers.LedgerJSONEncoder(ensure_ascii=False, separators=(',', ':')).encode(payload)
+        if renderers.dumps(payload) != expected.encode('utf-8'):
+            raise CommandError("Fast renderer output differs from the stdlib fallback.")
+        sample = payload["totals"][0]
+        self.stdout.write(f"Sample total: {renderers.dumps(sample).decode()}")
+        self.stdout.write(f"Backend: {'orjson' if renderers.orjson else 'stdlib (orjson not installed)'}")
+
+        for name, renderer in (("JSONRenderer", JSONRenderer()), ("FastJSONRenderer", renderers.FastJSONRenderer())):
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                body = renderer.render(payload, 'application/json', {})
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            megabytes = len(body) / (1024 * 1024)
+            self.stdout.write(f"{name:<18} {megabytes:6.2f} MB  {best * 1000 / megabytes:8.2f} ms/MB")
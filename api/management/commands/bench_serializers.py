@@ -0,0 +1,83 @@
+import datetime
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import Transaction
+from api.serializers import TransactionSerializer
+from api.utils.fast_serializers import FastListSerializer
+
+CHUNK = 10000
+
+
+def synthetic_transactions(count):
+    """Unsaved Transaction instances with varied field values."""
+    categories = [key for key, _ in Transaction.CATEGORIES]
+    start = timezone.now() - datetime.timedelta(days=3650)
+    return [
+        Transaction(
+            id=i + 1,
+            title=f"Transaction {i}",
+            amount=Decimal(i % 100000) / 100 + Decimal('0.01'),
+            transaction_type='income' if i % 3 == 0 else 'expense',
+            date=(start + datetime.timedelta(hours=i)).date(),
+            description=None if i % 2 else "Synthetic row",
+            category=categories[i % len(categories)],
+            user_id=(i % 50) + 1,
+            created_at=start + datetime.timedelta(hours=i, seconds=i % 60, microseconds=i % 1000),
+            updated_at=start + datetime.timedelta(hours=i + 1),
+            version=i + 1,
+        )
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that FastListSerializer matches TransactionSerializer on synthetic rows, "
+        "then report rows/sec for both at each requested size. api/tests.py holds the "
+        "same golden-output check against database rows for every ViewSet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000', help="Comma-separated row counts.")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        serializer = TransactionSerializer()
+        fast = FastListSerializer.build(serializer)
+        if fast is None:
+            raise CommandError("TransactionSerializer is not supported by FastListSerializer.")
+        instances = synthetic_transactions(min(CHUNK, max(sizes)))
+        # The values() rows the fast path would read for the same instances.
+        rows = [{column: getattr(instance, column) for column in fast.columns} for instance in instances]
+        expected = json.loads(json.dumps(TransactionSerializer(instances, many=True).data))
+        actual = json.loads(json.dumps(fast.serialize(rows)))
+        if expected != actual:
+            mismatch = next(i for i, (a, b) in enumerate(zip(expected, actual)) if a != b)
+            raise CommandError(f"Output differs at row {mismatch}: {expected[mismatch]} != {actual[mismatch]}")
+        self.stdout.write(self.style.SUCCESS(f"Golden output matches on {len(rows)} rows."))
+
+        report = []
+        for size in sizes:
+            drf = self.rate(size, lambda chunk: TransactionSerializer(instances[:chunk], many=True).data)
+            fast_rate = self.rate(size, lambda chunk: fast.serialize(rows[:chunk]))
+            report.append({
+                "rows": size,
+                "model_serializer_rows_per_sec": round(drf),
+                "fast_rows_per_sec": round(fast_rate),
+                "speedup": round(fast_rate / drf, 2),
+            })
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def rate(self, size, serialize):
+        # Serialize the same chunk repeatedly so a 1M-row run doesn't need 1M rows in memory.
+        done, started = 0, time.perf_counter()
+        while done < size:
+            chunk = min(CHUNK, size - done)
+            serialize(chunk)
+            done += chunk
+        return size / (time.perf_counter() - started)
@@ -0,0 +1,182 @@
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+from django.urls.resolvers import RoutePattern
+
+from api import urls as api_urls
+from api.authentication import tokens_for_user
+from api.urls import router
+
+# POST-only routes; they answer GET with 405 and need credentials or tokens in the body.
+SKIP_NAMES = {'logout', 'token_obtain_pair', 'token_refresh', 'token_verify'}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Call every GET endpoint in api/urls.py through the test client as one user and record "
+        "p50/p95 latency and queries per request, plus the process's peak RSS. With --save the run "
+        "becomes the JSON baseline; otherwise it is compared against the baseline and the command "
+        "fails when an endpoint regresses beyond --threshold. Seed data with `manage.py generate_data`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, required=True, help="Id of the user to call the endpoints as.")
+        parser.add_argument('--prefix', default='/api/', help="URL prefix the api app is mounted under.")
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per endpoint.")
+        parser.add_argument('--baseline', default='benchmark-baseline.json', help="Baseline JSON file.")
+        parser.add_argument('--save', action='store_true', help="Write this run as the new baseline.")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Allowed relative p95 and RSS growth before a run fails (0.25 = 25%%).")
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help="Ignore p95 growth smaller than this, which is timer noise.")
+        parser.add_argument('--cold-cache', action='store_true',
+                            help="Clear the caches before every request so aggregates are recomputed.")
+        parser.add_argument('--only', action='append', default=[],
+                            help="Only endpoints whose path contains this text (repeatable).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        client = Client()
+        client.cookies['access_token'] = str(tokens_for_user(user).access_token)
+
+        endpoints = {}
+        for url in self.endpoint_urls(options['prefix'], user):
+            if options['only'] and not any(text in url for text in options['only']):
+                continue
+            result = self.measure(client, url, options)
+            if result is not None:
+                endpoints[url] = result
+                self.stdout.write(
+                    f"{url:<60} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                    f"{result['queries']:3d} queries"
+                )
+
+        run = {
+            "user": user.pk,
+            "dataset": self.dataset(user),
+            "iterations": options['iterations'],
+            "cold_cache": options['cold_cache'],
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "peak_rss_mb": _peak_rss_mb(),
+            "endpoints": endpoints,
+        }
+        self.stdout.write(f"Peak RSS: {run['peak_rss_mb']} MB")
+
+        if options['save']:
+            with open(options['baseline'], 'w', encoding='utf-8') as baseline:
+                json.dump(run, baseline, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}."))
+            return
+
+        try:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                previous = json.load(baseline)
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {options['baseline']}; run with --save first.")
+        regressions = self.compare(previous, run, options)
+        for message in regressions:
+            self.stdout.write(self.style.ERROR(message))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def endpoint_urls(self, prefix, user):
+        for url_prefix, viewset, basename in router.registry:
+            yield f"{prefix}{url_prefix}/"
+            first = viewset.queryset.model.objects.filter(user=user).order_by('pk').first()
+            if first is not None:
+                yield f"{prefix}{url_prefix}/{first.pk}/"
+            for extra_action in viewset.get_extra_actions():
+                if not extra_action.detail and 'get' in extra_action.mapping:
+                    yield f"{prefix}{url_prefix}/{extra_action.url_path}/"
+        for pattern in api_urls.urlpatterns:
+            # Router routes are regex patterns and were covered above.
+            if not isinstance(pattern, URLPattern) or not isinstance(pattern.pattern, RoutePattern):
+                continue
+            route = str(pattern.pattern)
+            if pattern.name in SKIP_NAMES or '<' in route:
+                continue
+            yield f"{prefix}{route}"
+
+    def measure(self, client, url, options):
+        warmup = client.get(url)
+        if warmup.status_code in (403, 405):
+            return None
+        if warmup.status_code != 200:
+            self.stdout.write(self.style.WARNING(f"{url} returned {warmup.status_code}, skipped"))
+            return None
+
+        latencies, queries = [], []
+        for _ in range(options['iterations']):
+            if options['cold_cache']:
+                for cache in caches.all():
+                    cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured.captured_queries))
+        return {
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+            "queries": max(queries),
+        }
+
+    def dataset(self, user):
+        return {
+            "transactions": user.transactions.count(),
+            "bills": user.bills.count(),
+            "sales": user.sales.count(),
+            "petty_cash": user.petty_cash.count(),
+            "calendar_events": user.calendar_events.count(),
+        }
+
+    def compare(self, previous, run, options):
+        if previous.get("dataset") != run["dataset"]:
+            self.stdout.write(self.style.WARNING(
+                f"Dataset differs from the baseline ({previous.get('dataset')} vs {run['dataset']}); "
+                f"timings may not be comparable."
+            ))
+        limit = 1 + options['threshold']
+        regressions = []
+        for url, before in previous.get("endpoints", {}).items():
+            after = run["endpoints"].get(url)
+            if after is None:
+                if not options['only']:
+                    regressions.append(f"{url}: missing from this run")
+                continue
+            if after["p95_ms"] > before["p95_ms"] * limit and after["p95_ms"] - before["p95_ms"] > options['min_delta_ms']:
+                regressions.append(f"{url}: p95 {before['p95_ms']} ms -> {after['p95_ms']} ms")
+            if after["queries"] > before["queries"]:
+                regressions.append(f"{url}: {before['queries']} -> {after['queries']} queries per request")
+        if run["peak_rss_mb"] > previous.get("peak_rss_mb", run["peak_rss_mb"]) * limit:
+            regressions.append(f"peak RSS {previous['peak_rss_mb']} MB -> {run['peak_rss_mb']} MB")
+        return regressions
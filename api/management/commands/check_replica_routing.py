@@ -0,0 +1,123 @@
+import sqlite3
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from api.authentication import tokens_for_user
+from api.db import PIN_COOKIE
+from api.views import TransactionViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Check read-replica routing end to end through the test client: list reads go to a replica, "
+        "writes go to 'default', the writer's next reads stay on 'default' and see the new row, "
+        "token blacklist reads stay on 'default', and use_read_replica = False opts a view out. "
+        "Run with DJANGO_SETTINGS_MODULE=cashflow.replica_settings; the check writes one transaction "
+        "to the primary and deletes it again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, required=True, help="Id of the user to call the endpoints as.")
+        parser.add_argument('--prefix', default='/api/', help="URL prefix the api app is mounted under.")
+        parser.add_argument('--sync', action='store_true',
+                            help="Copy the primary SQLite database over each replica before checking.")
+
+    def handle(self, *args, **options):
+        replicas = list(getattr(settings, 'DATABASE_REPLICAS', ()))
+        if not replicas:
+            raise CommandError("DATABASE_REPLICAS is empty; run with DJANGO_SETTINGS_MODULE=cashflow.replica_settings.")
+        if options['sync']:
+            self.sync(replicas)
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        self.failures = []
+        self.served = []
+        url = f"{options['prefix']}transactions/"
+        reader, writer = self.client(user), self.client(user)
+
+        response = self.call(reader.get, url)
+        self.expect("GET list reads a replica", response, replicas)
+
+        response = self.call(writer.post, url, {
+            "title": "Replica routing check", "amount": "1.00", "transaction_type": "expense",
+            "date": timezone.localdate().isoformat(), "category": "other",
+        }, content_type='application/json')
+        self.expect("POST writes the primary", response, [DEFAULT_DB_ALIAS], status=201)
+        if PIN_COOKIE not in response.cookies:
+            self.failures.append("POST did not set the replica pin cookie")
+        created = response.json().get('id') if response.status_code == 201 else None
+
+        try:
+            response = self.call(writer.get, f"{url}{created}/")
+            self.expect("GET after a write reads the primary", response, [DEFAULT_DB_ALIAS])
+
+            response = self.call(reader.get, f"{url}{created}/")
+            self.expect("GET without the pin reads a replica", response, replicas, status=404)
+
+            TransactionViewSet.use_read_replica = False
+            try:
+                response = self.call(reader.get, url)
+                self.expect("use_read_replica = False reads the primary", response, [DEFAULT_DB_ALIAS])
+            finally:
+                del TransactionViewSet.use_read_replica
+        finally:
+            if created is not None:
+                self.call(writer.delete, f"{url}{created}/")
+
+        if router.db_for_read(BlacklistedToken) != DEFAULT_DB_ALIAS:
+            self.failures.append("token blacklist reads are not routed to the primary")
+        else:
+            self.stdout.write("token blacklist reads the primary: ok")
+
+        for message in self.failures:
+            self.stdout.write(self.style.ERROR(message))
+        if self.failures:
+            raise CommandError(f"{len(self.failures)} replica routing check(s) failed.")
+        self.stdout.write(self.style.SUCCESS("Replica routing behaves as configured."))
+
+    def sync(self, replicas):
+        source = str(connections.settings[DEFAULT_DB_ALIAS]['NAME'])
+        for alias in replicas:
+            connections[alias].close()
+            with sqlite3.connect(source) as src, sqlite3.connect(str(connections.settings[alias]['NAME'])) as dst:
+                src.backup(dst)
+            self.stdout.write(f"Copied {source} to replica '{alias}'.")
+
+    def client(self, user):
+        client = Client()
+        client.cookies['access_token'] = str(tokens_for_user(user).access_token)
+        return client
+
+    def call(self, method, *args, **kwargs):
+        """Calls the endpoint and records the aliases that ran its api_* queries."""
+        self.served = []
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self.recorder(alias)))
+            return method(*args, **kwargs)
+
+    def recorder(self, alias):
+        def record(execute, sql, params, many, context):
+            if 'api_' in sql:
+                self.served.append(alias)
+            return execute(sql, params, many, context)
+        return record
+
+    def expect(self, name, response, aliases, status=200):
+        served = set(self.served)
+        if response.status_code != status:
+            self.failures.append(f"{name}: expected status {status}, got {response.status_code}")
+        elif not served or not served <= set(aliases):
+            self.failures.append(f"{name}: queries ran on {sorted(served)}, expected {aliases}")
+        else:
+            self.stdout.write(f"{name}: ok ({', '.join(sorted(served))})")
@@ -0,0 +1,70 @@
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.urls import router
+from api.utils.plans import api_reads, full_scans, indexes_used, query_plan
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queries issued by every list and collection action, report full table "
+        "scans, and list the declared indexes that none of the plans used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, required=True, help="Id of the user to call the endpoints as.")
+        parser.add_argument('--prefix', default='/api/', help="URL prefix the api app is mounted under.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        client = Client()
+        client.cookies['access_token'] = str(RefreshToken.for_user(user).access_token)
+
+        offenders = []
+        used = set()
+        for url in self.collection_urls(options['prefix']):
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(url)
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f"{url} returned {response.status_code}, skipped"))
+                continue
+            for sql in api_reads(captured.captured_queries):
+                plan = query_plan(sql)
+                used.update(indexes_used(plan))
+                # Unfiltered reads touch every row by definition; only judge filtered ones.
+                if ' WHERE ' not in sql.upper():
+                    continue
+                for table in full_scans(plan):
+                    offenders.append((url, table, sql))
+
+        # Indexes only writes or POST actions use (e.g. the import dedupe lookup) show up here too.
+        unused = [name for name in self.declared_indexes() if name not in used]
+        if unused:
+            self.stdout.write(self.style.WARNING(f"Declared indexes no plan used: {', '.join(unused)}"))
+
+        for url, table, sql in offenders:
+            self.stdout.write(self.style.ERROR(f"{url}: full scan of {table}\n    {sql}"))
+        if offenders:
+            raise CommandError(f"{len(offenders)} queries scan a table without an index.")
+        self.stdout.write(self.style.SUCCESS("All list and collection actions use an index."))
+
+    def collection_urls(self, prefix):
+        for url_prefix, viewset, basename in router.registry:
+            yield f"{prefix}{url_prefix}/"
+            for extra_action in viewset.get_extra_actions():
+                if not extra_action.detail and 'get' in extra_action.mapping:
+                    yield f"{prefix}{url_prefix}/{extra_action.url_path}/"
+
+    def declared_indexes(self):
+        for model in apps.get_app_config('api').get_models():
+            for index in model._meta.indexes:
+                yield index.name
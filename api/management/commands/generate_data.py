@@ -0,0 +1,166 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import invalidate_aggregates
+from api.models import Bill, CalendarEvent, PettyCash, Sale, Transaction, allocate_control_numbers
+from api.utils.rollups import rebuild_rollups
+
+BATCH_SIZE = 5000
+
+# Relative weights for expense categories; income comes from the income categories below.
+EXPENSE_CATEGORIES = {
+    'food': 30, 'transport': 12, 'utilities': 8, 'bills': 8, 'shopping': 8, 'entertainment': 6,
+    'health': 4, 'subscriptions': 4, 'education': 3, 'travel': 3, 'insurance': 2, 'taxes': 2,
+    'loans': 2, 'gifts': 2, 'donations': 1, 'savings': 3, 'other': 2,
+}
+INCOME_CATEGORIES = {'salary': 50, 'sales': 30, 'investment': 15, 'other': 5}
+
+
+def _amount(rng, median):
+    # Log-normal spread: mostly small amounts with a long tail of large ones.
+    return Decimal(str(round(min(rng.lognormvariate(0, 0.9) * median, 99999999), 2))).quantize(Decimal('0.01'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset for benchmarking: users with transactions spread "
+        "over categories and years, plus bills, sales, petty cash and calendar events. "
+        "The same --seed and --end-date always produce the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Users to create.")
+        parser.add_argument('--transactions', type=int, default=100000,
+                            help="Transactions in total, split evenly across the users.")
+        parser.add_argument('--years', type=int, default=5, help="Years of history before --end-date.")
+        parser.add_argument('--end-date', type=datetime.date.fromisoformat, default=None,
+                            help="Last day of generated history (YYYY-MM-DD); defaults to today.")
+        parser.add_argument('--bills', type=int, default=200, help="Bills per user.")
+        parser.add_argument('--sales', type=int, default=500, help="Sales per user.")
+        parser.add_argument('--petty-cash', type=int, default=100, help="Petty cash requests per user.")
+        parser.add_argument('--events', type=int, default=200, help="Calendar events per user.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed.")
+        parser.add_argument('--prefix', default='bench', help="Username prefix for generated users.")
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete users with the prefix, and everything they own, first.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError("--users must be at least 1.")
+        rng = random.Random(options['seed'])
+        end = options['end_date'] or timezone.localdate()
+        start = end - datetime.timedelta(days=365 * options['years'])
+        self.days = (end - start).days + 1
+        self.start = start
+
+        prefix = options['prefix']
+        if options['clear']:
+            deleted, _ = User.objects.filter(username__startswith=f"{prefix}-").delete()
+            self.stdout.write(f"Deleted {deleted} rows owned by earlier '{prefix}' users.")
+        if User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Users named '{prefix}-*' already exist; pass --clear or another --prefix.")
+
+        password = make_password(prefix)
+        users = User.objects.bulk_create([
+            User(username=f"{prefix}-{i}", email=f"{prefix}-{i}@example.com", password=password)
+            for i in range(1, options['users'] + 1)
+        ])
+        per_user = options['transactions'] // len(users)
+
+        for user in users:
+            self.insert(Transaction, (self.transaction_row(rng, user) for _ in range(per_user)))
+            self.insert(Bill, (self.bill(rng, user, end) for _ in range(options['bills'])))
+            self.insert(Sale, (self.sale(rng, user) for _ in range(options['sales'])))
+            self.insert(PettyCash, (self.petty_cash(rng, user) for _ in range(options['petty_cash'])))
+            self.insert(CalendarEvent, (self.event(rng, user) for _ in range(options['events'])))
+            self.stdout.write(f"  {user.username} (id {user.pk})")
+
+        user_ids = [user.pk for user in users]
+        # bulk_create skips the signals that keep the rollups and the aggregate cache current.
+        with transaction.atomic():
+            rollups = rebuild_rollups(apps, user_ids=user_ids)
+        for model in (Transaction, Sale, Bill, PettyCash):
+            invalidate_aggregates(model._meta.model_name, user_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users with {per_user * len(users)} transactions "
+            f"from {start} to {end} and {rollups} rollup rows. Password: '{prefix}'."
+        ))
+
+    def insert(self, model, rows):
+        batch = []
+        with transaction.atomic():
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    self.flush(model, batch)
+                    batch = []
+            if batch:
+                self.flush(model, batch)
+
+    def flush(self, model, batch):
+        if model is PettyCash:
+            for row, control_number in zip(batch, allocate_control_numbers(len(batch))):
+                row.control_number = control_number
+        model.objects.bulk_create(batch)
+
+    def day(self, rng):
+        return self.start + datetime.timedelta(days=rng.randrange(self.days))
+
+    def transaction_row(self, rng, user):
+        if rng.random() < 0.2:
+            transaction_type, categories, median = 'income', INCOME_CATEGORIES, 1500
+        else:
+            transaction_type, categories, median = 'expense', EXPENSE_CATEGORIES, 40
+        category = rng.choices(list(categories), weights=list(categories.values()))[0]
+        return Transaction(
+            title=f"{category.title()} {transaction_type}",
+            amount=_amount(rng, median),
+            transaction_type=transaction_type,
+            date=self.day(rng),
+            description=None if rng.random() < 0.7 else "Synthetic transaction",
+            category=category,
+            category_other="Misc" if category == 'other' else None,
+            user=user,
+        )
+
+    def bill(self, rng, user, end):
+        due_date = self.day(rng)
+        return Bill(
+            title=rng.choice(("Electricity", "Water", "Internet", "Rent", "Phone", "Insurance")),
+            amount=_amount(rng, 120),
+            due_date=due_date,
+            is_paid=due_date < end - datetime.timedelta(days=30) or rng.random() < 0.3,
+            user=user,
+        )
+
+    def sale(self, rng, user):
+        return Sale(title=f"Order {rng.randrange(10 ** 6):06d}", amount=_amount(rng, 60), sale_date=self.day(rng), user=user)
+
+    def petty_cash(self, rng, user):
+        return PettyCash(
+            name=rng.choice(("Office supplies", "Fuel", "Meals", "Courier", "Repairs")),
+            amount=_amount(rng, 25),
+            date=self.day(rng),
+            isApproved=rng.random() < 0.8,
+            user=user,
+        )
+
+    def event(self, rng, user):
+        start = timezone.make_aware(datetime.datetime.combine(self.day(rng), datetime.time(rng.randrange(8, 18))))
+        all_day = rng.random() < 0.3
+        return CalendarEvent(
+            title=rng.choice(("Meeting", "Payment reminder", "Inventory", "Payroll", "Audit")),
+            start_date=start,
+            end_date=start + datetime.timedelta(days=1) if all_day else start + datetime.timedelta(hours=rng.randrange(1, 4)),
+            all_day=all_day,
+            user=user,
+        )
@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import CHUNK_SIZE, import_statement
+from api.utils.statements import StatementError, statement_format
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a CSV or OFX bank statement into a user's transactions, streaming the file in chunks. "
+        "Rows the user already has (same date, amount and title) are skipped, so re-running is safe."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Statement file.")
+        parser.add_argument('--user', type=int, required=True, help="Id of the user who owns the transactions.")
+        parser.add_argument('--format', choices=('csv', 'ofx'), default=None,
+                            help="Statement format; taken from the file extension by default.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_statement(
+                    stream, statement_format(options['path'], options['format']), user, options['chunk_size'],
+                )
+        except (OSError, StatementError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"line {error['line']}: {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.inserted} inserted, {report.skipped} skipped, {report.errored} errored "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,77 @@
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.authentication import tokens_for_user
+
+DASHBOARD_PATHS = (
+    'transactions/summary/',
+    'transactions/today_total_transactions/',
+    'transactions/yesterday_total_transactions/',
+    'transactions/todays_transactions/',
+    'sales/total_sales/',
+    'sales/todays_sales/',
+    'bills/total_bills/',
+    'bills/total_paid_bills/',
+    'bills/total_unpaid_bills/',
+    'bills/todays_bills/',
+    'petty-cash/total_petty_cash/',
+    'calendar-events/todays_events/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the dashboard fan-out against a running server and report throughput and latency. "
+        "Run it once against `gunicorn cashflow.wsgi` with sync workers and once against "
+        "`uvicorn cashflow.asgi:application` with --prefix /api/async/ on the same dataset to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help="Server to load.")
+        parser.add_argument('--prefix', default='/api/', help="Use /api/async/ for the ASGI-native endpoints.")
+        parser.add_argument('--user', type=int, required=True, help="Id of the user to authenticate as.")
+        parser.add_argument('--rounds', type=int, default=50, help="Dashboard loads to replay.")
+        parser.add_argument('--concurrency', type=int, default=12, help="Requests in flight at once.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        cookie = f"access_token={tokens_for_user(user).access_token}"
+        base = options['base_url'].rstrip('/') + options['prefix']
+        urls = [base + path for _ in range(options['rounds']) for path in DASHBOARD_PATHS]
+
+        def fetch(url):
+            request = urllib.request.Request(url, headers={"Cookie": cookie})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    ok = response.status == 200
+            except OSError:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        report = {
+            "base_url": base,
+            "requests": len(results),
+            "errors": sum(1 for _, ok in results if not ok),
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(results) / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
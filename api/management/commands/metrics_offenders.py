@@ -0,0 +1,56 @@
+import json
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Read a session recorded with REQUEST_METRICS_LOG and print the N+1 offenders "
+        "(the same query shape repeated within one request) and the slowest queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', nargs='?', help="Recorded session; defaults to REQUEST_METRICS_LOG.")
+        parser.add_argument('--top', type=int, default=10, help="Entries per section.")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Times a query shape must repeat in one request to count as N+1.")
+
+    def handle(self, *args, **options):
+        path = options['log'] or getattr(settings, 'REQUEST_METRICS_LOG', None)
+        if not path:
+            raise CommandError("Pass the log file or set REQUEST_METRICS_LOG.")
+        try:
+            with open(path, encoding='utf-8') as log:
+                entries = [json.loads(line) for line in log if line.strip()]
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+        # (view, sql): [requests affected, worst repeat count, total time]
+        repeated = defaultdict(lambda: [0, 0, 0.0])
+        slowest = []
+        for entry in entries:
+            view = entry["view"] or entry["path"]
+            shapes = Counter(query["sql"] for query in entry["queries"])
+            for sql, count in shapes.items():
+                if count >= options['repeat']:
+                    stats = repeated[(view, sql)]
+                    stats[0] += 1
+                    stats[1] = max(stats[1], count)
+                    stats[2] += sum(query["time"] for query in entry["queries"] if query["sql"] == sql)
+            slowest += [(query["time"], view, query["sql"]) for query in entry["queries"]]
+
+        self.stdout.write(f"{len(entries)} requests recorded.\n")
+        self.stdout.write(self.style.MIGRATE_HEADING(f"N+1 offenders (a query repeated {options['repeat']}+ times in one request)"))
+        ranked = sorted(repeated.items(), key=lambda item: item[1][2], reverse=True)[:options['top']]
+        if not ranked:
+            self.stdout.write("  none")
+        for (view, sql), (requests, worst, total) in ranked:
+            self.stdout.write(f"  {view}: x{worst} in {requests} request(s), {total * 1000:.1f} ms total")
+            self.stdout.write(f"    {sql}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nSlowest queries"))
+        for elapsed, view, sql in sorted(slowest, key=lambda item: item[0], reverse=True)[:options['top']]:
+            self.stdout.write(f"  {elapsed * 1000:.1f} ms  {view}")
+            self.stdout.write(f"    {sql}")
@@ -0,0 +1,18 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.utils.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily ledger rollup table from the raw transaction, sale, bill and petty cash rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help="Only rebuild rollups for this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_rollups(apps, user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows."))
@@ -0,0 +1,145 @@
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+from contextlib import nullcontext
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+
+from api.models import PettyCash, Transaction
+from api.utils.totals import transaction_totals
+
+# Django's SQLite defaults: rollback journal, deferred transactions, no pragmas, and each
+# statement of a save committed on its own, as the API's writes ran before AtomicWritesMixin.
+DEFAULT_PROFILE = {"options": {}, "pragmas": {}, "atomic_writes": False}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent reads and writes (transaction and petty cash creates, summary totals, "
+        "list reads) against two copies of the SQLite database, one with SQLite's defaults and "
+        "one with DATABASES OPTIONS and SQLITE_PRAGMAS from settings, and report the throughput "
+        "and the \"database is locked\" errors for each. The configured database itself is not written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent worker threads.")
+        parser.add_argument('--seconds', type=float, default=10.0, help="Duration of each profile's run.")
+        parser.add_argument('--write-ratio', type=float, default=0.3, help="Fraction of operations that write.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed for the operation mix.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("stress_sqlite only applies to the SQLite backend.")
+
+        db = connections.settings['default']
+        tuned = {
+            "options": dict(db.get('OPTIONS', {})),
+            "pragmas": getattr(settings, 'SQLITE_PRAGMAS', {}),
+            "atomic_writes": True,
+        }
+        source = str(db['NAME'])
+        original = (db['NAME'], db.get('OPTIONS', {}))
+        scratch = tempfile.mkdtemp(prefix='stress-sqlite-')
+        results = {}
+        try:
+            for name, profile in (("default", DEFAULT_PROFILE), ("tuned", tuned)):
+                path = os.path.join(scratch, f"{name}.sqlite3")
+                self.copy_database(source, path)
+                # Worker threads open their connections from this settings dict.
+                connections.close_all()
+                db['NAME'], db['OPTIONS'] = path, profile["options"]
+                with override_settings(SQLITE_PRAGMAS=profile["pragmas"]):
+                    results[name] = self.run(options, profile["atomic_writes"])
+                connections.close_all()
+        finally:
+            db['NAME'], db['OPTIONS'] = original
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<8} {result['reads_per_second']:9.1f} reads/s  {result['writes_per_second']:8.1f} writes/s  "
+                f"write p50/p95 {result['write_p50_ms']:.2f}/{result['write_p95_ms']:.2f} ms  {result['locked']} locked  {result['other_errors']} other errors"
+            )
+
+    def copy_database(self, source, path):
+        # The backup API copies a consistent snapshot even while the source is in WAL mode.
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        with sqlite3.connect(path) as dst:
+            dst.execute("PRAGMA journal_mode = DELETE")
+
+    def run(self, options, atomic_writes):
+        deadline = time.perf_counter() + options['seconds']
+        lock = threading.Lock()
+        totals = {"reads": 0, "writes": 0, "locked": 0, "other_errors": 0, "write_latencies": []}
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            stats = {"reads": 0, "writes": 0, "locked": 0, "other_errors": 0, "write_latencies": []}
+            try:
+                while time.perf_counter() < deadline:
+                    write = rng.random() < options['write_ratio']
+                    started = time.perf_counter()
+                    try:
+                        if write:
+                            self.write(rng, atomic_writes)
+                        else:
+                            self.read(rng)
+                    except OperationalError as exc:
+                        stats["locked" if 'locked' in str(exc) else "other_errors"] += 1
+                        continue
+                    if write:
+                        stats["writes"] += 1
+                        stats["write_latencies"].append(time.perf_counter() - started)
+                    else:
+                        stats["reads"] += 1
+            finally:
+                connection.close()
+            with lock:
+                for key, value in stats.items():
+                    totals[key] += value
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(totals.pop("write_latencies"))
+        return {
+            **totals,
+            "reads_per_second": totals["reads"] / elapsed,
+            "writes_per_second": totals["writes"] / elapsed,
+            "write_p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+            "write_p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        }
+
+    def write(self, rng, atomic_writes):
+        day = date(2024, 1, 1) + timedelta(days=rng.randrange(366))
+        amount = rng.randrange(100, 10000) / 100
+        with transaction.atomic() if atomic_writes else nullcontext():
+            if rng.random() < 0.5:
+                Transaction.objects.create(
+                    title="Stress", amount=amount, transaction_type=rng.choice(('income', 'expense')),
+                    date=day, category='other',
+                )
+            else:
+                # Also exercises the control number allocator.
+                PettyCash.objects.create(name="Stress", amount=amount, date=day)
+
+    def read(self, rng):
+        if rng.random() < 0.5:
+            transaction_totals(Transaction.objects.all(), {"range": (date(2024, 1, 1), date(2024, 12, 31))})
+        else:
+            list(Transaction.objects.order_by('-date', '-id').values('id', 'title', 'amount', 'date')[:100])
@@ -0,0 +1,250 @@
+"""
+Per-request instrumentation, enabled with ``REQUEST_METRICS_ENABLED``.
+
+``RequestMetricsMiddleware`` records, for every request, the resolved view
+name, the number of SQL queries and the time spent in the database, in
+serializers and in rendering. Totals are folded into in-process histograms
+served by ``/api/_metrics/`` in the Prometheus text format, and each
+response carries a ``Server-Timing`` header with the same figures. When
+``REQUEST_METRICS_LOG`` names a file, every request and its queries are
+appended to it as one JSON line for ``manage.py metrics_offenders``.
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .renderers import dumps
+
+_current = ContextVar('request_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (help, buckets, RequestRecord attribute)
+HISTOGRAMS = {
+    'api_request_duration_seconds': ("Wall time spent handling the request.", DURATION_BUCKETS, 'total_time'),
+    'api_db_queries': ("SQL queries executed per request.", COUNT_BUCKETS, 'query_count'),
+    'api_db_duration_seconds': ("Time spent executing SQL per request.", DURATION_BUCKETS, 'db_time'),
+    'api_serialize_duration_seconds': ("Time spent in serializers per request.", DURATION_BUCKETS, 'serialize_time'),
+    'api_render_duration_seconds': ("Time spent rendering the response body.", DURATION_BUCKETS, 'render_time'),
+}
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def normalize_sql(sql):
+    """Collapses ``IN (%s, %s, ...)`` lists so the same query shape groups together."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class RequestRecord:
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.view = None
+        self.status = None
+        self.started = time.perf_counter()
+        self.total_time = 0.0
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.query_count += 1
+            self.db_time += elapsed
+            self.queries.append((sql, elapsed))
+
+    def server_timing(self):
+        return ", ".join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_log_entry(self):
+        return {
+            "view": self.view,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "total_time": self.total_time,
+            "db_time": self.db_time,
+            "serialize_time": self.serialize_time,
+            "render_time": self.render_time,
+            "queries": [{"sql": normalize_sql(sql), "time": elapsed} for sql, elapsed in self.queries],
+        }
+
+
+@contextmanager
+def timed(phase):
+    """Adds the block's wall time to the active request's ``<phase>_time``."""
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        name = f'{phase}_time'
+        setattr(record, name, getattr(record, name) + time.perf_counter() - started)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, record):
+        labels = (record.view or 'unresolved', record.method)
+        with self.lock:
+            for name, (_, buckets, attribute) in HISTOGRAMS.items():
+                histogram = self.histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self.histograms[(name, labels)] = _Histogram(buckets)
+                histogram.observe(getattr(record, attribute))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (help_text, _, _) in HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (metric, (view, method)), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = f'view="{view}",method="{method}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.total}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.total}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+registry = _Registry()
+
+
+def _dispatch_query(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    return record(execute, sql, params, many, context)
+
+
+def _install_wrapper(connection, **kwargs):
+    # The hook connection.execute_wrapper() installs, but left in place for the
+    # connection's lifetime: under ASGI the async ORM runs queries on a worker
+    # thread's connection, which a per-request wrapper on this thread would miss.
+    # The request's record reaches that thread through the context variable.
+    if _dispatch_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch_query)
+
+
+_log_lock = threading.Lock()
+
+
+def _write_log(record):
+    path = getattr(settings, 'REQUEST_METRICS_LOG', None)
+    if not path:
+        return
+    line = dumps(record.as_log_entry()) + b'\n'
+    with _log_lock, open(path, 'ab') as log:
+        log.write(line)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count and DB, serializer and render time per request.
+    Works under WSGI and ASGI. DB time covers queries run while the view executes; a streamed export's
+    queries run after the response leaves the middleware and are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(_install_wrapper, dispatch_uid='request_metrics_wrapper')
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        record = RequestRecord(request)
+        token = _current.set(record)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(record, request, response)
+
+    async def __acall__(self, request):
+        record = RequestRecord(request)
+        token = _current.set(record)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(record, request, response)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time it from here to the post-render callback.
+        record = _current.get()
+        if record is not None:
+            record.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._rendered(record))
+        return response
+
+    def _rendered(self, record):
+        record.render_time += time.perf_counter() - record.render_started
+
+    def _finish(self, record, request, response):
+        record.total_time = time.perf_counter() - record.started
+        match = getattr(request, 'resolver_match', None)
+        record.view = match.view_name if match else None
+        record.status = response.status_code
+        response['Server-Timing'] = record.server_timing()
+        registry.observe(record)
+        _write_log(record)
+        return response
@@ -0,0 +1,83 @@
+# Generated by Django 5.2 on 2026-10-18 20:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_dailyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['due_date'], name='bill_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['is_paid', 'due_date'], name='bill_paid_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['due_date'], name='bill_unpaid_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['user', 'due_date'], name='bill_user_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['user', 'start_date'], name='event_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyrollup',
+            index=models.Index(fields=['source', 'day'], name='rollup_source_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pettycash',
+            index=models.Index(fields=['date'], name='petty_cash_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pettycash',
+            index=models.Index(fields=['isApproved', 'date'], name='petty_cash_approved_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pettycash',
+            index=models.Index(condition=models.Q(('isApproved', False)), fields=['date'], name='petty_cash_pending_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pettycash',
+            index=models.Index(fields=['user', 'date'], name='petty_cash_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sale_date'], name='sale_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['user', 'sale_date'], name='sale_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date'], name='txn_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date'], name='txn_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_type', 'date'], name='txn_user_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_type', 'date'], name='txn_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['category', 'date'], name='txn_category_date_idx'),
+        ),
+    ]
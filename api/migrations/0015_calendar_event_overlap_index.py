@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 21:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='calendarevent',
+            name='event_user_start_idx',
+        ),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['user', 'start_date', 'end_date'], name='event_user_start_end_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-18 21:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_calendar_event_overlap_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='recurrence_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='recurrence_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecurrenceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(choices=[('transaction', 'Transaction'), ('bill', 'Bill')], max_length=11)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=7)),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(blank=True, null=True)),
+                ('title', models.CharField(max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('transaction_type', models.CharField(blank=True, choices=[('income', 'Income'), ('expense', 'Expense')], max_length=7, null=True)),
+                ('category', models.CharField(choices=[('food', 'Food'), ('transport', 'Transport'), ('entertainment', 'Entertainment'), ('utilities', 'Utilities'), ('health', 'Health'), ('sales', 'Sales'), ('salary', 'Salary'), ('investment', 'Investment'), ('education', 'Education'), ('shopping', 'Shopping'), ('travel', 'Travel'), ('gifts', 'Gifts'), ('donations', 'Donations'), ('bills', 'Bills'), ('subscriptions', 'Subscriptions'), ('savings', 'Savings'), ('loans', 'Loans'), ('insurance', 'Insurance'), ('taxes', 'Taxes'), ('other', 'Other')], default='other', max_length=20)),
+                ('category_other', models.CharField(blank=True, max_length=255, null=True)),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('next_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recurrence_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bill',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bills', to='api.recurrencerule'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='api.recurrencerule'),
+        ),
+        migrations.AddConstraint(
+            model_name='bill',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'recurrence_date'), name='unique_bill_occurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'recurrence_date'), name='unique_transaction_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurrencerule',
+            index=models.Index(condition=models.Q(('next_date__isnull', False)), fields=['next_date'], name='recurrence_due_idx'),
+        ),
+    ]
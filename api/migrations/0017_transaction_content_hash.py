@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 21:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_content_hashes(apps, schema_editor):
+    from decimal import Decimal
+
+    from api.utils.statements import content_hash
+
+    Transaction = apps.get_model('api', 'Transaction')
+    batch = []
+    for row in Transaction.objects.order_by('pk').iterator(chunk_size=2000):
+        amount = -Decimal(str(row.amount)) if row.transaction_type == 'expense' else Decimal(str(row.amount))
+        row.content_hash = content_hash(row.user_id, row.date, amount, row.title)
+        batch.append(row)
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_recurrence_rules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'content_hash'], name='txn_user_hash_idx'),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
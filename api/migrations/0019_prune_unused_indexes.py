@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 21:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_sync_versions_tombstones'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bill',
+            name='bill_paid_due_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pettycash',
+            name='petty_cash_approved_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_user_type_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_type_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_category_date_idx',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,370 @@
+import csv
+from copy import copy
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import cached_aggregate, invalidate_aggregates
+from .metrics import timed
+from .models import DailyRollup
+from .permissions import owner_queryset
+from .renderers import dumps
+from .utils.fast_serializers import FastListSerializer
+from .utils.totals import ZERO, date_bound, date_window
+
+
+class AtomicWritesMixin:
+    """
+    Runs ``create``, ``update`` and ``destroy`` in one transaction, so a row,
+    its rollup and its control number commit together. With SQLite's
+    ``transaction_mode: IMMEDIATE`` the write lock is then taken at BEGIN,
+    where a busy writer is waited out, instead of halfway through the save,
+    where SQLite gives up at once with "database is locked".
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+
+class OwnerScopedMixin:
+    """
+    Scopes everything the ViewSet reads to the requesting user's rows:
+    ``list`` and detail routes, the custom actions and aggregates built on
+    ``get_queryset()``, and the rollup table. Superusers read all rows. New
+    rows are owned by the requesting user unless a superuser names another.
+    List this mixin first so it wraps the other mixins' querysets.
+    """
+    owner_field = 'user'
+
+    def get_queryset(self):
+        return owner_queryset(super().get_queryset(), self.request.user, self.owner_field)
+
+    def get_rollup_queryset(self):
+        return owner_queryset(super().get_rollup_queryset(), self.request.user)
+
+    def get_cache_scope(self):
+        # Matches the scopes invalidate_aggregates() bumps: '*' for all rows, else the owner's id.
+        return '*' if self.request.user.is_superuser else self.request.user.pk
+
+    def get_owner(self, requested=None):
+        user = self.request.user
+        if user.is_superuser and requested is not None:
+            return requested
+        return user
+
+    def perform_create(self, serializer):
+        serializer.save(**{self.owner_field: self.get_owner(serializer.validated_data.get(self.owner_field))})
+
+    def perform_update(self, serializer):
+        if self.request.user.is_superuser:
+            serializer.save()
+        else:
+            serializer.save(**{self.owner_field: self.request.user})
+
+    def perform_bulk_create(self, instances):
+        for instance in instances:
+            setattr(instance, self.owner_field, self.get_owner(getattr(instance, self.owner_field)))
+        return super().perform_bulk_create(instances)
+
+    def perform_bulk_update(self, instances, fields):
+        if not self.request.user.is_superuser:
+            for instance in instances:
+                setattr(instance, self.owner_field, self.request.user)
+        return super().perform_bulk_update(instances, fields)
+
+
+class RollupTotalsMixin:
+    """
+    Lets aggregate actions read the daily rollup table instead of re-summing
+    raw rows. ``rollup_source`` names the ``DailyRollup.source`` to read.
+    """
+    rollup_source = None
+
+    def use_rollups(self):
+        return getattr(settings, 'LEDGER_ROLLUPS_ENABLED', True)
+
+    def get_rollup_queryset(self):
+        return DailyRollup.objects.filter(source=self.rollup_source)
+
+    def total_amount(self, row_filters=None, rollup_filters=None):
+        if self.use_rollups():
+            queryset, field = self.get_rollup_queryset().filter(**(rollup_filters or {})), 'total'
+        else:
+            queryset, field = self.get_queryset().filter(**(row_filters or {})), 'amount'
+        return queryset.aggregate(total=Sum(field))['total'] or 0
+
+
+class PaginatedActionMixin:
+    """
+    Serializes ``list`` and collection actions through the view's paginator.
+    When ``FAST_LIST_SERIALIZATION`` is on and the serializer allows it, rows
+    are read with ``values()`` and rendered by ``FastListSerializer``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def get_fast_list_serializer(self):
+        if not getattr(settings, 'FAST_LIST_SERIALIZATION', True):
+            return None
+        return FastListSerializer.build(self.get_serializer())
+
+    def list_response(self, queryset):
+        fast = self.get_fast_list_serializer()
+        if fast is not None:
+            queryset = fast.prepare(queryset)
+        page = self.paginate_queryset(queryset)
+        rows = queryset if page is None else page
+        with timed('serialize'):
+            if fast is not None:
+                data = fast.serialize(rows)
+            else:
+                data = self.get_serializer(rows, many=True).data
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+class ExportMixin:
+    """
+    ``export`` action that streams the filtered queryset as NDJSON or CSV
+    (``?export_format=csv``). Rows are read with a chunked server-side
+    iterator and rendered one at a time, so memory use does not grow with
+    the number of rows exported.
+    """
+    export_chunk_size = 2000
+    export_formats = ('ndjson', 'csv')
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in self.export_formats:
+            raise ValidationError({"export_format": f"Choose one of: {', '.join(self.export_formats)}."})
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by('pk')
+        serializer = self.get_serializer()
+        rows = (serializer.to_representation(obj) for obj in queryset.iterator(chunk_size=self.export_chunk_size))
+
+        if export_format == 'csv':
+            content, content_type = self._csv_lines(serializer, rows), 'text/csv'
+        else:
+            content, content_type = self._ndjson_lines(rows), 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}-export.{export_format}"'
+        return response
+
+    def _ndjson_lines(self, rows):
+        for row in rows:
+            yield dumps(row) + b'\n'
+
+    def _csv_lines(self, serializer, rows):
+        columns = [name for name, field in serializer.fields.items() if not field.write_only]
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([row.get(column) for column in columns])
+
+
+class BulkMixin:
+    """
+    ``bulk`` action writing many rows per request: POST a list of new
+    records, PUT a list of full records with their ``id``, or DELETE a
+    list of ids. Every item is validated with the ViewSet's serializer and
+    the batch is written in one transaction, or not at all when any item
+    fails, in which case the response lists the errors by item position.
+    """
+    bulk_max_items = None
+
+    def get_bulk_max_items(self):
+        return self.bulk_max_items or getattr(settings, 'BULK_MAX_ITEMS', 500)
+
+    @action(detail=False, methods=['post', 'put', 'delete'])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({"detail": "Expected a list of items."})
+        if len(items) > self.get_bulk_max_items():
+            raise ValidationError({"detail": f"At most {self.get_bulk_max_items()} items per request."})
+
+        if request.method == 'POST':
+            return self.bulk_create_items(items)
+        if request.method == 'PUT':
+            return self.bulk_update_items(items)
+        return self.bulk_destroy_items(items)
+
+    def bulk_create_items(self, items):
+        serializer = self.get_serializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        instances = [model(**data) for data in serializer.validated_data]
+        with transaction.atomic():
+            instances = self.perform_bulk_create(instances)
+            DailyRollup.apply_instances(instances)
+        self.invalidate_bulk_aggregates(instances)
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, instances):
+        return self.get_queryset().model.objects.bulk_create(instances)
+
+    def bulk_update_items(self, items):
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        existing = self.get_queryset().in_bulk([pk for pk in ids if pk is not None])
+
+        errors, previous, updated, fields = [], [], [], set()
+        for pk, item in zip(ids, items):
+            instance = existing.get(pk)
+            if instance is None:
+                errors.append({"id": ["Not found."]})
+                continue
+            serializer = self.get_serializer(instance, data=item)
+            if not serializer.is_valid():
+                errors.append(serializer.errors)
+                continue
+            errors.append({})
+            previous.append(copy(instance))
+            for field, value in serializer.validated_data.items():
+                setattr(instance, field, value)
+                fields.add(field)
+            updated.append(instance)
+
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            self.perform_bulk_update(updated, fields)
+            DailyRollup.apply_instances(previous, sign=-1)
+            DailyRollup.apply_instances(updated)
+        self.invalidate_bulk_aggregates(previous + updated)
+        return Response(self.get_serializer(updated, many=True).data)
+
+    def perform_bulk_update(self, instances, fields):
+        if fields:
+            self.get_queryset().model.objects.bulk_update(instances, sorted(fields))
+
+    def invalidate_bulk_aggregates(self, instances):
+        # bulk_create and bulk_update send no post_save, so the aggregate cache is told directly.
+        model_name = self.get_queryset().model._meta.model_name
+        invalidate_aggregates(model_name, [instance.user_id for instance in instances if instance.user_id])
+
+    def bulk_destroy_items(self, items):
+        existing = self.get_queryset().in_bulk([pk for pk in items if isinstance(pk, int)])
+        errors = [{} if pk in existing else {"id": ["Not found."]} for pk in items]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Queryset delete still sends post_delete per row, which keeps the rollups current.
+        with transaction.atomic():
+            self.get_queryset().model.objects.filter(pk__in=list(existing)).delete()
+        return Response({"deleted": len(existing)})
+
+
+def _next_bucket(start, interval):
+    if interval == 'day':
+        return start + timedelta(days=1)
+    if interval == 'week':
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return date(start.year + 1, 1, 1)
+    return date(start.year, start.month + 1, 1)
+
+
+class TimeseriesMixin:
+    """
+    ``timeseries`` action bucketing amounts per day, week or month
+    (``?interval=``) in one GROUP BY, with gaps zero-filled and a running
+    ``cumulative`` total. ``date_from``/``date_to`` bound the range on
+    ``timeseries_date_field``; the view's filters apply as for ``list``.
+
+    Subclasses name their series in ``get_timeseries_aggregates()`` and
+    say how a bucket moves the running total in ``timeseries_net()``.
+    """
+    timeseries_date_field = 'date'
+    timeseries_truncs = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+    timeseries_max_buckets = 5000
+
+    def get_timeseries_aggregates(self):
+        return {"total": Sum('amount')}
+
+    def timeseries_net(self, bucket):
+        return bucket["total"]
+
+    @action(detail=False, methods=['get'])
+    @cached_aggregate
+    def timeseries(self, request):
+        interval = request.query_params.get('interval', 'day')
+        if interval not in self.timeseries_truncs:
+            raise ValidationError({"interval": f"Choose one of: {', '.join(self.timeseries_truncs)}."})
+
+        field = self.timeseries_date_field
+        date_from = date_bound(request.query_params, 'date_from')
+        date_to = date_bound(request.query_params, 'date_to')
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+
+        aggregates = {name: Coalesce(expression, ZERO) for name, expression in self.get_timeseries_aggregates().items()}
+        rows = (
+            queryset.filter(date_window(field, date_from, date_to))
+            .annotate(period=self.timeseries_truncs[interval](field))
+            .values('period')
+            .annotate(**aggregates)
+            .order_by('period')
+        )
+        by_period = {row['period']: row for row in rows}
+
+        opening = ZERO.value
+        if date_from is not None:
+            before = queryset.filter(**{f'{field}__lt': date_from}).aggregate(**aggregates)
+            opening = self.timeseries_net(before)
+
+        buckets = []
+        if by_period or (date_from and date_to):
+            first = min(by_period) if date_from is None else self._bucket_start(date_from, interval)
+            last = max(by_period) if date_to is None else self._bucket_start(date_to, interval)
+            if by_period:
+                first, last = min(first, min(by_period)), max(last, max(by_period))
+
+            cumulative, period = opening, first
+            while period <= last:
+                if len(buckets) >= self.timeseries_max_buckets:
+                    raise ValidationError({"interval": "Too many buckets; narrow the date range or widen the interval."})
+                row = by_period.get(period) or {name: ZERO.value for name in aggregates}
+                bucket = {name: row[name] for name in aggregates}
+                net = self.timeseries_net(bucket)
+                cumulative += net
+                buckets.append({"period": period, **bucket, "net": net, "cumulative": cumulative})
+                period = _next_bucket(period, interval)
+
+        return Response({"interval": interval, "opening": opening, "buckets": buckets})
+
+    def _bucket_start(self, day, interval):
+        if interval == 'week':
+            return day - timedelta(days=day.weekday())
+        if interval == 'month':
+            return day.replace(day=1)
+        return day
@@ -1,9 +1,74 @@
-from django.db import models
-import uuid
-from django.db.models.signals import pre_save
+from django.db import IntegrityError, models, router, transaction as db_transaction
+import calendar
+import datetime
+import threading
+from decimal import Decimal
+from django.db.models import F, Q
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from .utils.statements import content_hash
 
-class Transaction(models.Model):
+class SyncQuerySet(models.QuerySet):
+    """
+    Stamps a fresh sync ``version`` on the bulk paths, which skip ``pre_save``;
+    ``bulk_update`` also moves ``updated_at``, which ``auto_now`` leaves alone there.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        # The versions must commit with the rows; see SyncModel.save.
+        with db_transaction.atomic(using=self.db):
+            for obj, version in zip(objs, allocate_sync_versions(len(objs))):
+                obj.version = version
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        now = timezone.now()
+        with db_transaction.atomic(using=self.db):
+            for obj, version in zip(objs, allocate_sync_versions(len(objs))):
+                obj.version, obj.updated_at = version, now
+            return super().bulk_update(objs, [*fields, 'version', 'updated_at'], *args, **kwargs)
+
+
+class SyncModel(models.Model):
+    """
+    Base of the models ``/api/sync/`` reports. ``save`` runs in a transaction
+    so the ``version`` taken in ``pre_save`` commits with the row: the counter
+    row stays locked until then, and no higher version can become visible
+    before this one. Deletes already run in one through the collector.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with db_transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class TransactionQuerySet(SyncQuerySet):
+    """Also keeps ``content_hash`` current on the bulk paths."""
+    HASHED_FIELDS = {'user', 'user_id', 'date', 'amount', 'transaction_type', 'title'}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.content_hash = obj.compute_content_hash()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if self.HASHED_FIELDS & set(fields):
+            for obj in objs:
+                obj.content_hash = obj.compute_content_hash()
+            fields = [*fields, 'content_hash']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class Transaction(SyncModel):
     TRANSACTION_TYPES = [
         ('income', 'Income'),
         ('expense', 'Expense'),
@@ -39,45 +104,109 @@ class Transaction(models.Model):
     description = models.TextField(blank=True, null=True)
     category = models.CharField(max_length=20, choices=CATEGORIES, default='other')
     category_other = models.CharField(max_length=255, blank=True, null=True)
-    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='transactions', blank=True, null=True)
+    # Indexed through the composite indexes below, which all lead with user.
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='transactions', blank=True, null=True, db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    recurrence = models.ForeignKey('RecurrenceRule', on_delete=models.SET_NULL, related_name='transactions', blank=True, null=True)
+    recurrence_date = models.DateField(blank=True, null=True)
+    # Import dedupe key, see api.utils.statements.content_hash; kept current on every save.
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recurrence', 'recurrence_date'], name='unique_transaction_occurrence'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'content_hash'], name='txn_user_hash_idx'),
+            models.Index(fields=['user', 'version'], name='txn_user_version_idx'),
+            models.Index(fields=['date'], name='txn_date_idx'),
+            models.Index(fields=['user', 'date'], name='txn_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.transaction_type}) - {self.amount}"
+
+    def compute_content_hash(self):
+        signed = -Decimal(str(self.amount)) if self.transaction_type == 'expense' else Decimal(str(self.amount))
+        # create() and the serializers may leave the date as the string they were given.
+        date = self._meta.get_field('date').to_python(self.date)
+        return content_hash(self.user_id, date, signed, self.title)
     
-class CalendarEvent(models.Model):
+class CalendarEvent(SyncModel):
     title = models.CharField(max_length=255)
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
     description = models.TextField(blank=True, null=True)
     all_day = models.BooleanField(default=True)
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='calendar_events', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = SyncQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'version'], name='event_user_version_idx'),
+            models.Index(fields=['user', 'start_date', 'end_date'], name='event_user_start_end_idx'),
+        ]
 
     def __str__(self):
         return self.title
     
-class Bill(models.Model):
+class Bill(SyncModel):
     title = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     due_date = models.DateField()
     description = models.TextField(blank=True, null=True)
     is_paid = models.BooleanField(default=False)
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='bills', blank=True, null=True)
+    recurrence = models.ForeignKey('RecurrenceRule', on_delete=models.SET_NULL, related_name='bills', blank=True, null=True)
+    recurrence_date = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = SyncQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recurrence', 'recurrence_date'], name='unique_bill_occurrence'),
+        ]
+        indexes = [
+            models.Index(fields=['due_date'], name='bill_due_date_idx'),
+            models.Index(fields=['due_date'], condition=Q(is_paid=False), name='bill_unpaid_due_idx'),
+            models.Index(fields=['user', 'due_date'], name='bill_user_due_idx'),
+            models.Index(fields=['user', 'version'], name='bill_user_version_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.amount}"
     
-class Sale(models.Model):
+class Sale(SyncModel):
     title = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     sale_date = models.DateField()
     description = models.TextField(blank=True, null=True)
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='sales', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = SyncQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sale_date'], name='sale_date_idx'),
+            models.Index(fields=['user', 'sale_date'], name='sale_user_date_idx'),
+            models.Index(fields=['user', 'version'], name='sale_user_version_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.amount}"
     
-class PettyCash(models.Model):
+class PettyCash(SyncModel):
     control_number = models.CharField(max_length=11, blank=True, unique=True)
     name = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -85,17 +214,307 @@ class PettyCash(models.Model):
     description = models.TextField(blank=True, null=True)
     isApproved = models.BooleanField(default=False)
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='petty_cash', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = SyncQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='petty_cash_date_idx'),
+            models.Index(fields=['date'], condition=Q(isApproved=False), name='petty_cash_pending_date_idx'),
+            models.Index(fields=['user', 'date'], name='petty_cash_user_date_idx'),
+            models.Index(fields=['user', 'version'], name='petty_cash_user_version_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.amount}"
 
-def generate_unique_control_number():
-    while True:
-        code = f"PC-{uuid.uuid4().hex[:8].upper()}"
-        if not PettyCash.objects.filter(control_number=code).exists():
-            return code
+class Sequence(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} - {self.value}"
+
+    @classmethod
+    def reserve(cls, name, size):
+        """Advance the named counter by ``size`` and return the reserved values."""
+        while True:
+            try:
+                with db_transaction.atomic():
+                    # UPDATE first so the write lock is taken before the read.
+                    if not cls.objects.filter(name=name).update(value=F('value') + size):
+                        cls.objects.create(name=name, value=size)
+                    end = cls.objects.filter(name=name).values_list('value', flat=True).get()
+                return range(end - size + 1, end + 1)
+            except IntegrityError:
+                # Another worker created the counter first; bump it instead.
+                continue
+
+class ControlNumberAllocator:
+    """
+    Hands out ``PC-XXXXXXXX`` control numbers from blocks reserved on a
+    shared counter, so a save costs no uniqueness probe. Each block is
+    checked once against existing rows to skip legacy random codes.
+    """
+    sequence_name = 'petty_cash_control_number'
+    block_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def allocate(self, count=1):
+        with self._lock:
+            codes, self._pending = self._pending[:count], self._pending[count:]
+        # Reserve without holding the lock: a thread inside a write transaction holds the
+        # SQLite write lock and may be waiting for ours, which would deadlock until busy_timeout.
+        while len(codes) < count:
+            codes += self._reserve(max(self.block_size, count - len(codes)))
+        codes, rest = codes[:count], codes[count:]
+        if rest:
+            # A block reserved inside a transaction is only ours once it commits; on
+            # rollback the counter goes back and the spare numbers are dropped with it.
+            db_transaction.on_commit(lambda: self._release(rest))
+        return codes
+
+    def _release(self, codes):
+        with self._lock:
+            self._pending.extend(codes)
+
+    def _reserve(self, size):
+        codes = [f"PC-{value:08X}" for value in Sequence.reserve(self.sequence_name, size)]
+        taken = set(PettyCash.objects.filter(control_number__in=codes).values_list('control_number', flat=True))
+        return [code for code in codes if code not in taken]
+
+control_number_allocator = ControlNumberAllocator()
+
+def allocate_control_numbers(count):
+    return control_number_allocator.allocate(count)
+
+def allocate_sync_versions(count):
+    """
+    Next ``count`` values of the change counter shared by the synced models.
+    The counter row stays write-locked until the caller's transaction commits,
+    so versions become visible in the order they were handed out.
+    """
+    return Sequence.reserve('sync_version', count) if count else range(0)
+
+@receiver(pre_save, sender=Transaction)
+def set_content_hash(sender, instance, raw=False, **kwargs):
+    instance.content_hash = instance.compute_content_hash()
 
 @receiver(pre_save, sender=PettyCash)
 def add_control_number(sender, instance, **kwargs):
     if not instance.control_number:
-        instance.control_number = generate_unique_control_number()
\ No newline at end of file
+        instance.control_number = allocate_control_numbers(1)[0]
+
+class RecurrenceRule(models.Model):
+    """
+    Template for a transaction or bill that repeats every ``interval`` days,
+    weeks or months from ``start_date``, until ``end_date`` or ``count``
+    occurrences. ``manage.py materialize_recurrences`` writes the due rows;
+    ``next_date`` is the first occurrence not written yet, or ``None`` once
+    the rule has run out.
+    """
+    TARGETS = [
+        ('transaction', 'Transaction'),
+        ('bill', 'Bill'),
+    ]
+
+    FREQUENCIES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
+
+    target = models.CharField(max_length=11, choices=TARGETS)
+    frequency = models.CharField(max_length=7, choices=FREQUENCIES)
+    interval = models.PositiveSmallIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)
+    count = models.PositiveIntegerField(blank=True, null=True)
+    title = models.CharField(max_length=255)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.TextField(blank=True, null=True)
+    transaction_type = models.CharField(max_length=7, choices=Transaction.TRANSACTION_TYPES, blank=True, null=True)
+    category = models.CharField(max_length=20, choices=Transaction.CATEGORIES, default='other')
+    category_other = models.CharField(max_length=255, blank=True, null=True)
+    occurrences = models.PositiveIntegerField(default=0)
+    next_date = models.DateField(blank=True, null=True)
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='recurrence_rules', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_date'], condition=Q(next_date__isnull=False), name='recurrence_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.frequency}) - {self.amount}"
+
+    def save(self, *args, **kwargs):
+        self.next_date = self.occurrence_date(self.occurrences)
+        super().save(*args, **kwargs)
+
+    def occurrence_date(self, index):
+        """
+        Date of the ``index``-th occurrence (0 is ``start_date``), or ``None``
+        past ``end_date`` or ``count``. Monthly dates are counted from the
+        start, so a rule on the 31st lands on each month's last day and
+        returns to the 31st when the month has one.
+        """
+        if self.count is not None and index >= self.count:
+            return None
+        step = index * self.interval
+        if self.frequency == 'daily':
+            day = self.start_date + datetime.timedelta(days=step)
+        elif self.frequency == 'weekly':
+            day = self.start_date + datetime.timedelta(weeks=step)
+        else:
+            year, month = divmod(self.start_date.month - 1 + step, 12)
+            year += self.start_date.year
+            month += 1
+            day = datetime.date(year, month, min(self.start_date.day, calendar.monthrange(year, month)[1]))
+        if self.end_date is not None and day > self.end_date:
+            return None
+        return day
+
+    def build_occurrence(self, day):
+        """Unsaved ``Transaction`` or ``Bill`` for the occurrence on ``day``."""
+        common = {
+            "title": self.title, "amount": self.amount, "description": self.description,
+            "user_id": self.user_id, "recurrence": self, "recurrence_date": day,
+        }
+        if self.target == 'bill':
+            return Bill(due_date=day, **common)
+        return Transaction(
+            date=day, transaction_type=self.transaction_type, category=self.category,
+            category_other=self.category_other, **common,
+        )
+
+class DailyRollup(models.Model):
+    SOURCES = [
+        ('transaction', 'Transaction'),
+        ('sale', 'Sale'),
+        ('bill', 'Bill'),
+        ('petty_cash', 'Petty Cash'),
+    ]
+
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='daily_rollups', blank=True, null=True)
+    source = models.CharField(max_length=12, choices=SOURCES)
+    day = models.DateField()
+    category = models.CharField(max_length=20, blank=True, default='')
+    kind = models.CharField(max_length=10)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'source', 'day', 'category', 'kind'], name='unique_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'day'], name='rollup_source_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.day} {self.kind} - {self.total}"
+
+    @classmethod
+    def apply(cls, key, amount, count):
+        if cls.objects.filter(**key).update(total=F('total') + amount, count=F('count') + count):
+            return
+        if count < 0:
+            # The rollup row is already gone, e.g. its owner is being deleted in the same cascade.
+            return
+        with db_transaction.atomic():
+            rollup, created = cls.objects.get_or_create(**key, defaults={"total": amount, "count": count})
+            if not created:
+                cls.objects.filter(pk=rollup.pk).update(total=F('total') + amount, count=F('count') + count)
+
+    @classmethod
+    def apply_instances(cls, instances, sign=1):
+        """Fold many saved or deleted rows into the rollup; used where signals don't fire (bulk_create, bulk_update)."""
+        deltas = {}
+        for instance in instances:
+            key = tuple(rollup_key(instance).items())
+            amount, count = deltas.get(key, (Decimal('0'), 0))
+            deltas[key] = (amount + sign * Decimal(str(instance.amount)), count + sign)
+        for key, (amount, count) in deltas.items():
+            cls.apply(dict(key), amount, count)
+
+def rollup_key(instance):
+    if isinstance(instance, Transaction):
+        source, day, category, kind = 'transaction', instance.date, instance.category, instance.transaction_type
+    elif isinstance(instance, Sale):
+        source, day, category, kind = 'sale', instance.sale_date, '', 'sale'
+    elif isinstance(instance, Bill):
+        source, day, category, kind = 'bill', instance.due_date, '', 'paid' if instance.is_paid else 'unpaid'
+    else:
+        source, day, category, kind = 'petty_cash', instance.date, '', 'approved' if instance.isApproved else 'pending'
+    return {"user_id": instance.user_id, "source": source, "day": day, "category": category, "kind": kind}
+
+ROLLUP_MODELS = (Transaction, Sale, Bill, PettyCash)
+
+def remember_rollup_row(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk and not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._rollup_previous = (rollup_key(previous), previous.amount)
+
+def update_rollup_on_save(sender, instance, **kwargs):
+    key, amount = rollup_key(instance), Decimal(str(instance.amount))
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is None:
+        DailyRollup.apply(key, amount, 1)
+    elif previous[0] == key:
+        DailyRollup.apply(key, amount - previous[1], 0)
+    else:
+        DailyRollup.apply(previous[0], -previous[1], -1)
+        DailyRollup.apply(key, amount, 1)
+    instance._rollup_previous = None
+
+def update_rollup_on_delete(sender, instance, **kwargs):
+    DailyRollup.apply(rollup_key(instance), -Decimal(str(instance.amount)), -1)
+
+for rollup_model in ROLLUP_MODELS:
+    pre_save.connect(remember_rollup_row, sender=rollup_model, dispatch_uid=f'rollup_pre_save_{rollup_model.__name__}')
+    post_save.connect(update_rollup_on_save, sender=rollup_model, dispatch_uid=f'rollup_post_save_{rollup_model.__name__}')
+    post_delete.connect(update_rollup_on_delete, sender=rollup_model, dispatch_uid=f'rollup_post_delete_{rollup_model.__name__}')
+
+class Tombstone(models.Model):
+    """
+    A deleted row of a synced model, kept so ``/api/sync/`` can report the
+    delete. ``version`` comes from the same counter as the live rows.
+    """
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    version = models.BigIntegerField()
+    # No constraint: tombstones outlive the rows, and are written while a user's rows cascade.
+    user = models.ForeignKey('auth.User', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', blank=True, null=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'version'], name='tombstone_user_version_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at version {self.version}"
+
+SYNC_MODELS = (Transaction, CalendarEvent, Bill, Sale, PettyCash)
+
+def stamp_sync_version(sender, instance, raw=False, **kwargs):
+    instance.version = allocate_sync_versions(1)[0]
+
+def add_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk, user_id=instance.user_id,
+        version=allocate_sync_versions(1)[0],
+    )
+
+for sync_model in SYNC_MODELS:
+    pre_save.connect(stamp_sync_version, sender=sync_model, dispatch_uid=f'sync_pre_save_{sync_model.__name__}')
+    post_delete.connect(add_tombstone, sender=sync_model, dispatch_uid=f'sync_post_delete_{sync_model.__name__}')
@@ -0,0 +1,143 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _rest_setting(name, default):
+    return getattr(settings, 'REST_FRAMEWORK', {}).get(name, default)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-based pagination on ``(<ordering field>, id)``. Each page is a single
+    indexed range query no matter how deep the client has scrolled, and the
+    opaque cursor stays stable while rows are inserted ahead of it.
+
+    Views choose the ordering field with ``keyset_ordering``, e.g. ``'-date'``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = '-id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = _rest_setting('PAGE_SIZE', 100)
+        max_page_size = _rest_setting('MAX_PAGE_SIZE', 1000)
+        requested = request.query_params.get(self.page_size_query_param)
+        if requested:
+            try:
+                page_size = int(requested)
+            except ValueError:
+                pass
+        return max(1, min(page_size, max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of ``paginate_queryset``; ``request`` must be a DRF ``Request``."""
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        model_field = queryset.model._meta.get_field(self.field_name)
+
+        self.cursor = self.decode_cursor(request, model_field)
+        self.reverse = bool(self.cursor and self.cursor['reverse'])
+        # A previous-page request walks the index the other way, then flips the rows back.
+        descending = self.descending != self.reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field_name}', f'{prefix}id')
+
+        if self.cursor:
+            op = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{op}': self.cursor['value']})
+                | Q(**{self.field_name: self.cursor['value'], f'id__{op}': self.cursor['id']})
+            )
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = self.cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = rows
+        return rows
+
+    def decode_cursor(self, request, model_field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return {
+                "value": model_field.to_python(data['v']),
+                "id": int(data['id']),
+                "reverse": bool(data.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances, or dicts when the view serializes from values().
+        if isinstance(row, dict):
+            value, pk = row[self.field_name], row['id']
+        else:
+            value, pk = getattr(row, self.field_name), row.pk
+        data = {"v": value.isoformat() if hasattr(value, 'isoformat') else str(value), "id": pk}
+        if reverse:
+            data['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
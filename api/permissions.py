@@ -19,3 +19,15 @@ class IsSuperAdminOrOwner(BasePermission):
 
         # Write permissions are only allowed to the owner or a superuser
         return obj.user == request.user or request.user.is_superuser
+
+
+def owner_queryset(queryset, user, owner_field='user'):
+    """
+    Limits ``queryset`` to the rows ``user`` owns. Superusers see every row,
+    matching the access ``IsSuperAdminOrOwner`` gives them.
+    """
+    if user is None or not user.is_authenticated:
+        return queryset.none()
+    if user.is_superuser:
+        return queryset
+    return queryset.filter(**{owner_field: user})
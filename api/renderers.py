@@ -0,0 +1,95 @@
+"""
+JSON renderer and parser that use orjson when it is installed and fall back
+to DRF's stdlib-based classes otherwise. Both paths render the same bytes
+for the same data: Decimals become strings with two decimal places, and
+dates and datetimes become ISO 8601 strings, with ``Z`` for UTC.
+"""
+import datetime
+import decimal
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+CENT = decimal.Decimal('0.01')
+
+
+def decimal_string(value):
+    """Money amounts as strings, matching ``DecimalField(decimal_places=2)``."""
+    if value.is_finite():
+        value = value.quantize(CENT)
+    return str(value)
+
+
+class LedgerJSONEncoder(encoders.JSONEncoder):
+    """DRF's encoder with the fast renderer's Decimal and datetime output."""
+
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return decimal_string(obj)
+        if isinstance(obj, datetime.datetime):
+            text = obj.isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return super().default(obj)
+
+
+_fallback_encoder = LedgerJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _default(obj):
+    # orjson handles str/int/float/dict/list and dates natively; this covers the rest.
+    if isinstance(obj, decimal.Decimal):
+        return decimal_string(obj)
+    return _fallback_encoder.default(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes for ``data``."""
+    if orjson is None:
+        return _fallback_encoder.encode(data).encode('utf-8')
+    return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` rendering through orjson. Indented output (the browsable
+    API, ``?indent=``) and non-default ``UNICODE_JSON``/``COMPACT_JSON``
+    settings go through the stdlib path.
+    """
+    encoder_class = LedgerJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = dumps(data)
+        # Same escaping as JSONRenderer: U+2028/U+2029 are valid JSON but not valid JavaScript.
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """``JSONParser`` decoding UTF-8 bodies with orjson."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Transaction, CalendarEvent, PettyCash, Bill, Sale
+from .models import Transaction, CalendarEvent, PettyCash, Bill, Sale, RecurrenceRule
+from .metrics import timed
 from .utils.fields import LocalDateTimeField
 
 class BaseModelSerializer(serializers.ModelSerializer):
@@ -9,12 +10,20 @@ class BaseModelSerializer(serializers.ModelSerializer):
             field_class = LocalDateTimeField
         return field_class, field_kwargs
 
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
 class TransactionSerializer(BaseModelSerializer):
     class Meta:
         model = Transaction
-        fields = '__all__'
+        exclude = ('content_hash',)
 
-        read_only_fields = ('created_at',)
+        read_only_fields = ('created_at', 'recurrence', 'recurrence_date')
+        # The (recurrence, recurrence_date) constraint covers read-only fields written by
+        # materialize_recurrences; checking it per row would only cost a queryset build.
+        validators = []
         extra_kwargs = {
             'title': {'required': True},
             'amount': {'required': True},
@@ -67,7 +76,10 @@ class BillSerializer(BaseModelSerializer):
         model = Bill
         fields = '__all__'
 
-        read_only_fields = ('created_at',)
+        read_only_fields = ('created_at', 'recurrence', 'recurrence_date')
+        # The (recurrence, recurrence_date) constraint covers read-only fields written by
+        # materialize_recurrences; checking it per row would only cost a queryset build.
+        validators = []
         extra_kwargs = {
             'title': {'required': True},
             'amount': {'required': True},
@@ -97,4 +109,30 @@ class SaleSerializer(BaseModelSerializer):
     def validate(self, data):
         if data['amount'] <= 0:
             raise serializers.ValidationError("Amount must be greater than zero.")
-        return data
\ No newline at end of file
+        return data
+
+class RecurrenceRuleSerializer(BaseModelSerializer):
+    class Meta:
+        model = RecurrenceRule
+        fields = '__all__'
+
+        read_only_fields = ('created_at', 'occurrences', 'next_date')
+        extra_kwargs = {
+            'target': {'required': True},
+            'frequency': {'required': True},
+            'start_date': {'required': True},
+            'title': {'required': True},
+            'amount': {'required': True},
+            'interval': {'min_value': 1},
+            'count': {'min_value': 1},
+        }
+
+    def validate(self, data):
+        def value(name):
+            return data[name] if name in data else getattr(self.instance, name, None)
+
+        if value('target') == 'transaction' and not value('transaction_type'):
+            raise serializers.ValidationError({"transaction_type": "Required for recurring transactions."})
+        if value('end_date') is not None and value('end_date') < value('start_date'):
+            raise serializers.ValidationError("End date must be on or after start date.")
+        return data
@@ -0,0 +1,87 @@
+"""
+``/api/sync/?since=<token>`` returns what changed in the caller's data after
+``since``: the current rows of every synced model written since then and the
+ids deleted since then, oldest change first.
+
+Every save, bulk write and delete of a synced model takes the next value of
+one shared change counter (``version`` on the row, or on its ``Tombstone``),
+so a sync is one ``(user, version)`` index range per table, bounded by the
+page size, and costs the number of changes rather than the size of the data.
+Pass ``next`` back as ``since`` until ``has_more`` is false; ``since=0`` (the
+default) fetches everything.
+"""
+from collections import defaultdict
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .metrics import timed
+from .models import Tombstone
+from .pagination import KeysetPagination
+from .permissions import owner_queryset
+from .views import BillViewSet, CalendarEventViewSet, PettyCashViewSet, SaleViewSet, TransactionViewSet
+
+# Response key: viewset whose queryset and serializer are synced.
+SYNC_VIEWSETS = {
+    'transactions': TransactionViewSet,
+    'calendar_events': CalendarEventViewSet,
+    'bills': BillViewSet,
+    'sales': SaleViewSet,
+    'petty_cash': PettyCashViewSet,
+}
+
+# Tombstone.model (the model name) -> response key.
+SYNC_KEYS = {viewset.queryset.model._meta.model_name: key for key, viewset in SYNC_VIEWSETS.items()}
+
+
+def _since(params):
+    try:
+        since = int(params.get('since', 0))
+    except ValueError:
+        raise ValidationError({"since": "Must be a sync token from a previous response."})
+    if since < 0:
+        raise ValidationError({"since": "Must be a sync token from a previous response."})
+    return since
+
+
+def _changes(queryset, user, since, limit):
+    # limit + 1 rows tell whether this table has more after the page.
+    return list(owner_queryset(queryset, user).filter(version__gt=since).order_by('version')[:limit + 1])
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sync_view(request):
+    since = _since(request.query_params)
+    limit = KeysetPagination().get_page_size(request)
+
+    # (version, response key or None for a delete, row)
+    pending = []
+    for key, viewset in SYNC_VIEWSETS.items():
+        pending.extend((row.version, key, row) for row in _changes(viewset.queryset, request.user, since, limit))
+    pending.extend((row.version, None, row) for row in _changes(Tombstone.objects.all(), request.user, since, limit))
+    pending.sort(key=lambda change: change[0])
+    page = pending[:limit]
+
+    changed, deleted = defaultdict(list), defaultdict(list)
+    for version, key, row in page:
+        if key is None:
+            deleted[SYNC_KEYS[row.model]].append(row.object_id)
+        else:
+            changed[key].append(row)
+
+    data = {}
+    with timed('serialize'):
+        for key, viewset in SYNC_VIEWSETS.items():
+            data[key] = {
+                "changed": viewset.serializer_class(changed[key], many=True, context={"request": request}).data,
+                "deleted": deleted[key],
+            }
+    return Response({
+        "since": since,
+        "next": page[-1][0] if page else since,
+        "has_more": len(pending) > limit,
+        **data,
+    })
@@ -1,3 +1,1585 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import zoneinfo
+from contextlib import ExitStack, closing
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import pre_save
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import renderers
+from .authentication import _BlacklistSnapshot, blacklist, revoke_token, tokens_for_user
+from .cache import data_version
+from .db import PIN_COOKIE, ReplicaRouter, use_replica
+from .imports import import_statement
+from .metrics import RequestRecord, registry
+from .models import (
+    Bill, CalendarEvent, ControlNumberAllocator, DailyRollup, PettyCash, RecurrenceRule, Sale, Sequence, Transaction,
+    control_number_allocator,
+)
+from .urls import router
+from .utils.fast_serializers import FastListSerializer
+from .utils.plans import api_reads, full_scans, indexes_used, query_plan
+from .utils.recurrence import materialize_recurrences
+from .utils.totals import date_window
+from .utils.rollups import rebuild_rollups
+from .views import CalendarEventViewSet, TransactionViewSet
+
+# Query strings for collection actions that reject a bare GET.
+REQUIRED_PARAMS = {'range': '?from=2024-01-01&to=2024-02-01'}
+
+
+def run_concurrently(workers, target):
+    """Run ``target(index)`` on ``workers`` threads started together; returns the exceptions raised."""
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def run(index):
+        try:
+            barrier.wait()
+            target(index)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def create_ledger(user, day=datetime.date(2024, 1, 15)):
+    """A few rows of every model for ``user``."""
+    for offset, (kind, category) in enumerate((('income', 'salary'), ('expense', 'food'), ('expense', 'transport'))):
+        Transaction.objects.create(
+            title=f"Row {offset}", amount=Decimal('10.00') * (offset + 1), transaction_type=kind,
+            category=category, date=day + datetime.timedelta(days=offset), user=user,
+        )
+    Bill.objects.create(title="Power", amount=Decimal('50.00'), due_date=day, user=user)
+    Sale.objects.create(title="Stall", amount=Decimal('20.00'), sale_date=day, user=user)
+    PettyCash.objects.create(name="Fuel", amount=Decimal('5.00'), date=day, user=user)
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time(9)))
+    CalendarEvent.objects.create(title="Meeting", start_date=start, end_date=start + datetime.timedelta(hours=1), user=user)
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='x')
+        cls.admin = User.objects.create_superuser('plan-admin', password='x')
+        create_ledger(cls.user)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def plans(self, url, user=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = client_for(user or self.user).get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return [(sql, query_plan(sql)) for sql in api_reads(captured.captured_queries)]
+
+    def indexes(self, url, user=None):
+        return {name for sql, plan in self.plans(url, user) for name in indexes_used(plan)}
+
+    def test_collection_actions_do_not_scan_tables(self):
+        for url_prefix, viewset, basename in router.registry:
+            urls = [f'/api/{url_prefix}/'] + [
+                f'/api/{url_prefix}/{extra.url_path}/{REQUIRED_PARAMS.get(extra.url_path, "")}'
+                for extra in viewset.get_extra_actions() if not extra.detail and 'get' in extra.mapping
+            ]
+            for url in urls:
+                with self.subTest(url=url):
+                    for sql, plan in self.plans(url):
+                        if ' WHERE ' in sql.upper():
+                            self.assertEqual(full_scans(plan), [], f"{sql}\n{plan}")
+
+    def test_owner_lists_use_user_date_indexes(self):
+        self.assertIn('txn_user_date_idx', self.indexes('/api/transactions/'))
+        self.assertIn('txn_user_date_idx', self.indexes('/api/transactions/?transaction_type=expense'))
+        self.assertIn('txn_user_date_idx', self.indexes('/api/transactions/filter_by_category/?category=food'))
+        self.assertIn('bill_user_due_idx', self.indexes('/api/bills/pending_bills/'))
+        self.assertIn('sale_user_date_idx', self.indexes('/api/sales/'))
+        self.assertIn('petty_cash_user_date_idx', self.indexes('/api/petty-cash/'))
+        self.assertIn('event_user_start_end_idx', self.indexes('/api/calendar-events/range/?from=2024-01-01&to=2024-02-01'))
+
+    def test_superuser_lists_use_date_indexes(self):
+        self.assertIn('txn_date_idx', self.indexes('/api/transactions/', self.admin))
+        self.assertIn('bill_unpaid_due_idx', self.indexes('/api/bills/pending_bills/', self.admin))
+        self.assertIn('petty_cash_pending_date_idx', self.indexes('/api/petty-cash/pending_petty_cash/', self.admin))
+
+    def test_sync_uses_version_indexes(self):
+        self.assertLessEqual(
+            {'txn_user_version_idx', 'event_user_version_idx', 'bill_user_version_idx', 'sale_user_version_idx',
+             'petty_cash_user_version_idx', 'tombstone_user_version_idx'},
+            self.indexes('/api/sync/?since=1'),
+        )
+
+    def test_import_dedupe_uses_hash_index(self):
+        statement = io.BytesIO(b"date,description,amount\n2024-01-15,Row 0,10.00\n")
+        with CaptureQueriesContext(connection) as captured:
+            import_statement(statement, 'csv', self.user)
+        lookups = [sql for sql in api_reads(captured.captured_queries) if 'content_hash' in sql and 'IN (' in sql]
+        self.assertTrue(lookups)
+        for sql in lookups:
+            self.assertIn('txn_user_hash_idx', indexes_used(query_plan(sql)))
+
+
+class BulkOwnershipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('bulk-owner', password='x')
+        cls.other = User.objects.create_user('bulk-other', password='x')
+        cls.admin = User.objects.create_superuser('bulk-admin', password='x')
+
+    def setUp(self):
+        self.row = Transaction.objects.create(
+            title="Rent", amount=Decimal('100.00'), transaction_type='expense', category='bills',
+            date=datetime.date(2024, 3, 1), user=self.owner,
+        )
+
+    def bulk_put(self, user, owner_id):
+        item = {
+            "id": self.row.pk, "title": "Rent", "amount": "120.00", "transaction_type": "expense",
+            "category": "bills", "date": "2024-03-01", "user": owner_id,
+        }
+        return client_for(user).put('/api/transactions/bulk/', [item], format='json')
+
+    def test_bulk_update_cannot_move_rows_to_another_user(self):
+        response = self.bulk_put(self.owner, self.other.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.user, self.owner)
+        self.assertEqual(self.row.amount, Decimal('120.00'))
+        self.assertFalse(DailyRollup.objects.filter(user=self.other).exists())
+        self.assertEqual(DailyRollup.objects.get(user=self.owner, source='transaction').total, Decimal('120.00'))
+
+    def test_superuser_bulk_update_can_reassign_rows(self):
+        response = self.bulk_put(self.admin, self.other.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.user, self.other)
+        self.assertEqual(DailyRollup.objects.get(user=self.other, source='transaction').total, Decimal('120.00'))
+        self.assertEqual(DailyRollup.objects.get(user=self.owner, source='transaction').count, 0)
+
+
+class ControlNumberTests(TransactionTestCase):
+    workers = 8
+    per_worker = 250
+
+    def setUp(self):
+        # Small blocks make the workers refill, and so contend, many times per test.
+        self.addCleanup(setattr, control_number_allocator, 'block_size', control_number_allocator.block_size)
+        control_number_allocator.block_size = 5
+        # Numbers cached by an earlier test belong to a counter the flush has reset.
+        control_number_allocator._pending.clear()
+        self.addCleanup(control_number_allocator._pending.clear)
+
+    def test_concurrent_allocators_hand_out_unique_numbers(self):
+        codes = []
+
+        def allocate(index):
+            # One allocator per thread stands in for one per worker process.
+            allocator = ControlNumberAllocator()
+            allocator.block_size = 7
+            for _ in range(self.per_worker):
+                codes.extend(allocator.allocate(1))
+
+        self.assertEqual(run_concurrently(self.workers, allocate), [])
+        self.assertEqual(len(codes), self.workers * self.per_worker)
+        self.assertEqual(len(set(codes)), len(codes))
+
+    def test_concurrent_creates_get_unique_control_numbers(self):
+        queries = []
+
+        def create(index):
+            # Each thread has its own connection, so each captures its own queries.
+            with CaptureQueriesContext(connection) as captured:
+                for number in range(self.per_worker):
+                    # Half the rows are saved inside a transaction, as the API's writes are.
+                    if number % 2:
+                        with transaction.atomic():
+                            PettyCash.objects.create(name=f"W{index}", amount=Decimal('1.00'), date=datetime.date(2024, 1, 1))
+                    else:
+                        PettyCash.objects.create(name=f"W{index}", amount=Decimal('1.00'), date=datetime.date(2024, 1, 1))
+            queries.extend(query['sql'] for query in captured.captured_queries)
+
+        self.assertEqual(run_concurrently(self.workers, create), [])
+        rows = self.workers * self.per_worker
+        codes = list(PettyCash.objects.values_list('control_number', flat=True))
+        self.assertEqual(len(codes), rows)
+        self.assertEqual(len(set(codes)), len(codes))
+
+        # The only read of the petty cash table is the one uniqueness probe per reserved block.
+        reservations = [sql for sql in queries if sql.startswith('UPDATE "api_sequence"') and 'petty_cash_control_number' in sql]
+        probes = [sql for sql in queries if sql.startswith('SELECT') and 'FROM "api_pettycash"' in sql]
+        self.assertTrue(all('"control_number" IN (' in sql for sql in probes), probes[:3])
+        # A counter row created by a racing worker makes a reservation retry, without a probe.
+        self.assertLessEqual(len(probes), len(reservations))
+        self.assertLessEqual(len(probes), rows // control_number_allocator.block_size + self.workers)
+
+    def test_reserved_blocks_skip_existing_codes(self):
+        PettyCash.objects.create(name="Legacy", amount=Decimal('1.00'), date=datetime.date(2024, 1, 1), control_number='PC-00000002')
+        allocator = ControlNumberAllocator()
+        codes = allocator.allocate(5)
+        self.assertNotIn('PC-00000002', codes)
+        self.assertEqual(len(set(codes)), 5)
+
+
+class PettyCashWriteTests(TestCase):
+    body = {'name': 'Float', 'amount': '5.00', 'date': '2024-01-15'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cashier', password='x')
+
+    def setUp(self):
+        control_number_allocator._pending.clear()
+        self.addCleanup(control_number_allocator._pending.clear)
+        self.client = client_for(self.user)
+
+    def create(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post('/api/petty-cash/', self.body, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Savepoints depend on how deeply the test nests the request; count the statements.
+        return [query['sql'] for query in captured.captured_queries if 'SAVEPOINT' not in query['sql']]
+
+    def test_create_in_a_request_transaction_reuses_the_reserved_block(self):
+        first = self.create()
+        self.assertTrue(any('petty_cash_control_number' in sql for sql in first))
+
+        # Sync version (UPDATE, SELECT), the INSERT and the rollup UPDATE; no control number reservation or probe.
+        second = self.create()
+        self.assertEqual(len(second), 4, second)
+        self.assertFalse(any('api_sequence' in sql and 'petty_cash_control_number' in sql for sql in second))
+        self.assertFalse(any(sql.startswith('SELECT "api_pettycash"') for sql in second))
+
+    def test_block_reserved_in_a_rolled_back_transaction_is_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ZeroDivisionError):
+                with transaction.atomic():
+                    PettyCash.objects.create(name="Void", amount=Decimal('1.00'), date=datetime.date(2024, 1, 1))
+                    1 / 0
+        # The counter rolled back with the block, so its numbers are free to be reserved again.
+        self.assertEqual(control_number_allocator._pending, [])
+        self.create()
+        self.create()
+        codes = list(PettyCash.objects.values_list('control_number', flat=True))
+        self.assertEqual(sorted(codes), ['PC-00000001', 'PC-00000002'])
+
+
+class ConcurrentWriteTests(TransactionTestCase):
+    workers = 8
+    per_worker = 10
+
+    def setUp(self):
+        caches['default'].clear()
+        control_number_allocator._pending.clear()
+        self.addCleanup(control_number_allocator._pending.clear)
+        self.users = [User.objects.create_user(f'writer{index}', password='x') for index in range(self.workers)]
+
+    def test_concurrent_api_writers_are_not_locked_out(self):
+        def write(index):
+            client = client_for(self.users[index])
+            for number in range(self.per_worker):
+                responses = (
+                    client.post('/api/transactions/', {
+                        'title': f"Sale {number}", 'amount': '1.50', 'transaction_type': 'income',
+                        'category': 'salary', 'date': '2024-01-15',
+                    }, format='json'),
+                    client.post('/api/petty-cash/', {'name': f"Float {number}", 'amount': '2.00', 'date': '2024-01-15'}, format='json'),
+                    client.get('/api/transactions/summary/'),
+                )
+                for response in responses:
+                    if response.status_code >= 300:
+                        raise AssertionError(f"{response.status_code}: {response.content[:200]}")
+
+        self.assertEqual(run_concurrently(self.workers, write), [])
+        rows = self.workers * self.per_worker
+        self.assertEqual(Transaction.objects.count(), rows)
+        self.assertEqual(PettyCash.objects.count(), rows)
+        codes = set(PettyCash.objects.values_list('control_number', flat=True))
+        self.assertEqual(len(codes), rows)
+
+        # Every row's rollup increment committed with the row.
+        for user in self.users:
+            rollups = {rollup.source: rollup for rollup in DailyRollup.objects.filter(user=user)}
+            self.assertEqual(rollups['transaction'].count, self.per_worker)
+            self.assertEqual(rollups['transaction'].total, Decimal('1.50') * self.per_worker)
+            self.assertEqual(rollups['petty_cash'].count, self.per_worker)
+            self.assertEqual(rollups['petty_cash'].total, Decimal('2.00') * self.per_worker)
+
+
+class AggregateCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached', password='x')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = client_for(self.user)
+
+    def add_income(self, amount, day):
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                title="Pay", amount=Decimal(amount), transaction_type='income', category='salary', date=day, user=self.user,
+            )
+
+    def test_write_after_a_cached_read_is_not_answered_with_304(self):
+        today = timezone.localdate()
+        self.add_income('10.00', today)
+        first = self.client.get('/api/transactions/today_total_transactions/')
+        self.assertNotIn('Last-Modified', first)
+
+        self.add_income('5.00', today)
+        for headers in ({'HTTP_IF_NONE_MATCH': first['ETag']}, {'HTTP_IF_MODIFIED_SINCE': http_date()}):
+            replay = self.client.get('/api/transactions/today_total_transactions/', **headers)
+            self.assertEqual(replay.status_code, 200, headers)
+            self.assertEqual(Decimal(str(replay.data['total_income'])), Decimal('15.00'))
+
+        unchanged = self.client.get('/api/transactions/today_total_transactions/', HTTP_IF_NONE_MATCH=replay['ETag'])
+        self.assertEqual(unchanged.status_code, 304)
+
+    def test_day_relative_totals_roll_over_at_midnight_without_a_write(self):
+        now = timezone.now()
+        self.add_income('10.00', timezone.localdate(now))
+        first = self.client.get('/api/transactions/today_total_transactions/')
+        self.assertEqual(Decimal(str(first.data['total_income'])), Decimal('10.00'))
+
+        with mock.patch('django.utils.timezone.now', return_value=now + datetime.timedelta(days=1)):
+            for headers in ({'HTTP_IF_NONE_MATCH': first['ETag']}, {'HTTP_IF_MODIFIED_SINCE': http_date()}):
+                tomorrow = self.client.get('/api/transactions/today_total_transactions/', **headers)
+                self.assertEqual(tomorrow.status_code, 200, headers)
+                self.assertEqual(Decimal(str(tomorrow.data['total_income'])), Decimal('0'))
+            yesterday = self.client.get('/api/transactions/yesterday_total_transactions/')
+        self.assertEqual(Decimal(str(yesterday.data['total_income'])), Decimal('10.00'))
+
+    def test_invalidation_waits_for_the_commit(self):
+        before = data_version('transaction', self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Transaction.objects.create(
+                title="Pay", amount=Decimal('1.00'), transaction_type='income', category='salary',
+                date=datetime.date(2024, 1, 1), user=self.user,
+            )
+            self.assertEqual(data_version('transaction', self.user.pk), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(data_version('transaction', self.user.pk), before)
+
+
+class TokenRevocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('revoked', password='x')
+
+    def setUp(self):
+        # Row ids are reused after each test's rollback, so start every test from an empty snapshot.
+        blacklist.clear()
+        self.addCleanup(blacklist.clear)
+        self.refresh = tokens_for_user(self.user)
+        self.access = self.refresh.access_token
+
+    def cookie_client(self):
+        client = APIClient()
+        client.cookies['access_token'] = str(self.access)
+        client.cookies['refresh_token'] = str(self.refresh)
+        return client
+
+    def test_logout_blacklists_the_access_token_in_the_database(self):
+        self.assertEqual(self.cookie_client().get('/api/me/').status_code, 200)
+        self.assertEqual(self.cookie_client().post('/api/logout/').status_code, 200)
+
+        jti = self.access['jti']
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=jti).exists())
+        self.assertEqual(self.cookie_client().get('/api/me/').status_code, 401)
+
+    def test_other_workers_reject_a_revoked_token_after_their_refresh(self):
+        access = self.access
+        other_worker = _BlacklistSnapshot()
+        self.assertNotIn(access['jti'], other_worker)
+
+        revoke_token(access)
+        self.assertNotIn(access['jti'], other_worker)
+        with override_settings(AUTH_BLACKLIST_REFRESH_SECONDS=0):
+            self.assertIn(access['jti'], other_worker)
+
+    def test_snapshot_holds_only_unexpired_tokens(self):
+        now = timezone.now()
+        for jti, expires_at in (('expired', now - datetime.timedelta(hours=1)), ('live', now + datetime.timedelta(hours=1))):
+            token = OutstandingToken.objects.create(jti=jti, token='-', user=self.user, expires_at=expires_at)
+            BlacklistedToken.objects.create(token=token)
+
+        snapshot = _BlacklistSnapshot()
+        with self.assertNumQueries(1):
+            self.assertIn('live', snapshot)
+        self.assertNotIn('expired', snapshot)
+        self.assertEqual(set(snapshot._expiry), {'live'})
+
+
+class SummaryWindowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('windows', password='x')
+        create_ledger(cls.user)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_malformed_dates_are_rejected(self):
+        client = client_for(self.user)
+        for url in ('/api/transactions/summary/', '/api/dashboard/?widgets=summary'):
+            for query in ('date_from=garbage', 'date_to=2024-13-45'):
+                with self.subTest(url=url, query=query):
+                    response = client.get(f"{url}{'&' if '?' in url else '?'}{query}")
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(query.split('=')[0], response.data)
+
+    def test_async_summary_rejects_malformed_dates(self):
+        client = APIClient()
+        client.cookies['access_token'] = str(tokens_for_user(self.user).access_token)
+        response = client.get('/api/async/transactions/summary/?date_from=garbage')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date_from', response.json())
+
+    def test_date_range_bounds_the_totals(self):
+        response = client_for(self.user).get('/api/transactions/summary/?date_from=2024-01-16&date_to=2024-01-17')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(str(response.data['total_expense'])), Decimal('50.00'))
+
+
+class FastListSerializerTests(TestCase):
+    """Golden output: the values() fast path renders exactly what the ModelSerializers do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('golden', password='x')
+        create_ledger(cls.user)
+        rule = RecurrenceRule.objects.create(
+            target='transaction', frequency='monthly', start_date=datetime.date(2024, 1, 31), title="Rent",
+            amount=Decimal('1200.5'), transaction_type='expense', category='bills', user=cls.user,
+        )
+        # Edge values: extra and missing decimal places, empty and null text, an occurrence link.
+        Transaction.objects.create(
+            title="", amount=Decimal('0.1'), transaction_type='income', category='other', description='',
+            category_other=None, date=datetime.date(2024, 2, 29), user=cls.user,
+        )
+        Transaction.objects.create(
+            title="Rent", amount=Decimal('99999999.99'), transaction_type='expense', category='bills',
+            date=datetime.date(2024, 1, 31), recurrence=rule, recurrence_date=datetime.date(2024, 1, 31), user=cls.user,
+        )
+        Bill.objects.create(title="Paid", amount=Decimal('7'), due_date=datetime.date(2024, 2, 1), is_paid=True, user=cls.user)
+        PettyCash.objects.create(name="Approved", amount=Decimal('3.3'), date=datetime.date(2024, 2, 1), isApproved=True, user=cls.user)
+        # Either side of the 2024-03-10 daylight saving change in New York.
+        for hour in (5, 8):
+            start = datetime.datetime(2024, 3, 10, hour, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+            CalendarEvent.objects.create(title=f"{hour}h", start_date=start, end_date=start + datetime.timedelta(days=1),
+                                         all_day=False, user=cls.user)
+
+    def assertMatchesModelSerializer(self, viewset):
+        fast = FastListSerializer.build(viewset.serializer_class())
+        self.assertIsNotNone(fast, viewset.__name__)
+        queryset = viewset.queryset.model.objects.order_by('pk')
+        expected = json.loads(json.dumps(viewset.serializer_class(list(queryset), many=True).data))
+        actual = json.loads(json.dumps(fast.serialize(fast.prepare(queryset))))
+        self.assertTrue(expected)
+        self.assertEqual(actual, expected)
+
+    def test_every_viewset_matches_its_model_serializer(self):
+        for url_prefix, viewset, basename in router.registry:
+            with self.subTest(viewset=viewset.__name__):
+                self.assertMatchesModelSerializer(viewset)
+
+    def test_datetimes_match_in_a_zone_with_daylight_saving(self):
+        for url_prefix, viewset, basename in router.registry:
+            with self.subTest(viewset=viewset.__name__), timezone.override(zoneinfo.ZoneInfo('America/New_York')):
+                self.assertMatchesModelSerializer(viewset)
+
+    def test_datetimes_match_across_a_half_hour_transition(self):
+        # Lord Howe Island moves between +10:30 and +11:00; in 2024 the change to +11:00 was at
+        # 15:30 UTC on October 5th, halfway through a UTC hour. The 15:10 row is serialized first.
+        for minute in (10, 29, 30, 45):
+            start = datetime.datetime(2024, 10, 5, 15, minute, tzinfo=datetime.timezone.utc)
+            CalendarEvent.objects.create(title=f"15:{minute}", start_date=start, end_date=start + datetime.timedelta(hours=1),
+                                         all_day=False, user=self.user)
+        with timezone.override(zoneinfo.ZoneInfo('Australia/Lord_Howe')):
+            self.assertMatchesModelSerializer(CalendarEventViewSet)
+            fast = FastListSerializer.build(CalendarEventViewSet.serializer_class())
+            rows = fast.serialize(fast.prepare(CalendarEvent.objects.filter(title__startswith="15:").order_by('pk')))
+        self.assertEqual([row['start_date'] for row in rows], [
+            '2024-10-06T01:40:00+10:30', '2024-10-06T01:59:00+10:30',
+            '2024-10-06T02:30:00+11:00', '2024-10-06T02:45:00+11:00',
+        ])
+
+    def test_list_responses_are_identical_with_the_fast_path_off(self):
+        client = client_for(self.user)
+        for url_prefix, viewset, basename in router.registry:
+            url = f'/api/{url_prefix}/'
+            with self.subTest(url=url):
+                fast = client.get(url)
+                with override_settings(FAST_LIST_SERIALIZATION=False):
+                    slow = client.get(url)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(json.loads(fast.content), json.loads(slow.content))
+
+
+@skipUnless(connection.vendor == 'sqlite', "The replica is a file copy of the SQLite test database.")
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    url = '/api/transactions/'
+
+    @classmethod
+    def setUpClass(cls):
+        # A second database that only changes when setUp copies the primary into it, so a
+        # read that reaches it cannot see rows written afterwards.
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings['replica'] = {
+            **connections[DEFAULT_DB_ALIAS].settings_dict,
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        # Declared here rather than on the class: the runner checks every declared alias
+        # before any test runs, when 'replica' does not exist yet.
+        cls.databases = {DEFAULT_DB_ALIAS, 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        del cls.databases
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        self.user = User.objects.create_user('replicated', password='x')
+        self.copied = Transaction.objects.create(
+            title="Copied", amount=Decimal('1.00'), transaction_type='income', date=datetime.date(2024, 1, 15), user=self.user,
+        )
+        self.sync_replica()
+        self.primary_only = Transaction.objects.create(
+            title="Not replicated yet", amount=Decimal('2.00'), transaction_type='income', date=datetime.date(2024, 1, 16), user=self.user,
+        )
+
+    def sync_replica(self):
+        connections['replica'].close()
+        connections[DEFAULT_DB_ALIAS].ensure_connection()
+        with closing(sqlite3.connect(connections['replica'].settings_dict['NAME'])) as replica:
+            connections[DEFAULT_DB_ALIAS].connection.backup(replica)
+
+    def call(self, method, *args, **kwargs):
+        """Calls the endpoint; returns the response and the aliases that ran its api_* queries."""
+        served = set()
+
+        def recorder(alias):
+            def record(execute, sql, params, many, context):
+                if 'api_' in sql:
+                    served.add(alias)
+                return execute(sql, params, many, context)
+            return record
+
+        with ExitStack() as stack:
+            for alias in self.databases:
+                stack.enter_context(connections[alias].execute_wrapper(recorder(alias)))
+            response = method(*args, **kwargs)
+        return response, served
+
+    def listed_ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.json()['results']}
+
+    def test_safe_method_reads_go_to_the_replica(self):
+        response, served = self.call(client_for(self.user).get, self.url)
+        self.assertEqual(served, {'replica'})
+        self.assertEqual(self.listed_ids(response), {self.copied.id})
+
+    def test_writer_reads_its_own_writes_from_the_primary(self):
+        writer = client_for(self.user)
+        response, served = self.call(writer.post, self.url, {
+            'title': "Fresh", 'amount': '3.00', 'transaction_type': 'expense', 'category': 'food', 'date': '2024-01-17',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(served, {DEFAULT_DB_ALIAS})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        created = f"{self.url}{response.json()['id']}/"
+
+        response, served = self.call(writer.get, created)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(served, {DEFAULT_DB_ALIAS})
+
+        # A client without the pin still reads the replica, which has not caught up.
+        response, served = self.call(client_for(self.user).get, created)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(served, {'replica'})
+
+    def test_views_that_opt_out_read_the_primary(self):
+        with mock.patch.object(TransactionViewSet, 'use_read_replica', False, create=True):
+            response, served = self.call(client_for(self.user).get, self.url)
+        self.assertEqual(served, {DEFAULT_DB_ALIAS})
+        self.assertEqual(self.listed_ids(response), {self.copied.id, self.primary_only.id})
+
+    def test_token_blacklist_and_transactional_reads_stay_on_the_primary(self):
+        router = ReplicaRouter()
+        with use_replica('replica'):
+            self.assertEqual(router.db_for_read(Transaction), 'replica')
+            self.assertEqual(router.db_for_read(BlacklistedToken), DEFAULT_DB_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Transaction), DEFAULT_DB_ALIAS)
+                self.assertTrue(Transaction.objects.filter(pk=self.primary_only.pk).exists())
+
+
+class StatementImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('importer', password='x')
+
+    def run_import(self, *lines, chunk_size=2):
+        statement = io.BytesIO("\n".join(("date,description,amount",) + lines).encode())
+        return import_statement(statement, 'csv', self.user, chunk_size=chunk_size).as_dict()
+
+    def test_content_hash_accepts_a_string_date(self):
+        row = Transaction.objects.create(
+            title="Coffee", amount='3.50', transaction_type='expense', date='2024-01-15', user=self.user,
+        )
+        same = Transaction(title="Coffee", amount=Decimal('3.50'), transaction_type='expense', date=datetime.date(2024, 1, 15), user=self.user)
+        self.assertEqual(row.content_hash, same.compute_content_hash())
+
+    def test_identical_rows_in_one_file_are_all_imported(self):
+        # The three coffees land in two chunks, so the count must carry across chunks too.
+        lines = ("2024-01-15,Coffee,-3.50", "2024-01-15,Coffee,-3.50", "2024-01-15,Coffee,-3.50", "2024-01-16,Lunch,-9.00")
+        report = self.run_import(*lines)
+        self.assertEqual((report['inserted'], report['skipped']), (4, 0))
+
+        report = self.run_import(*lines)
+        self.assertEqual((report['inserted'], report['skipped']), (0, 4))
+        self.assertEqual(Transaction.objects.filter(user=self.user, title="Coffee").count(), 3)
+
+    def test_overlapping_statement_adds_only_the_new_rows(self):
+        self.run_import("2024-01-15,Coffee,-3.50", "2024-01-16,Lunch,-9.00")
+        report = self.run_import("2024-01-15,Coffee,-3.50", "2024-01-15,Coffee,-3.50", "2024-01-17,Fuel,-40.00")
+        self.assertEqual((report['inserted'], report['skipped']), (2, 1))
+        self.assertEqual(Transaction.objects.filter(user=self.user, title="Coffee").count(), 2)
+
+
+class RendererTests(TestCase):
+    payload = {
+        "amounts": [Decimal('1.5'), Decimal('2.345'), Decimal('-0.004'), Decimal('1000000'), Decimal('3.10')],
+        "day": datetime.date(2024, 2, 29),
+        "utc": datetime.datetime(2024, 1, 15, 9, 30, 1, 250, tzinfo=datetime.timezone.utc),
+        "offset": datetime.datetime(2024, 3, 10, 1, 59, tzinfo=zoneinfo.ZoneInfo('America/New_York')),
+        "naive": datetime.datetime(2024, 1, 15, 9, 30),
+        "text": "Caf\u00e9 \u2028",
+        "nested": [{"total": Decimal('0'), "count": 3, "flag": None}],
+    }
+
+    def fallback(self, data):
+        return renderers.LedgerJSONEncoder(ensure_ascii=False, separators=(',', ':')).encode(data).encode('utf-8')
+
+    def test_fast_dumps_matches_the_stdlib_fallback(self):
+        self.assertEqual(renderers.dumps(self.payload), self.fallback(self.payload))
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.dumps(self.payload), self.fallback(self.payload))
+
+    def test_decimals_and_datetimes_render_as_the_serializers_do(self):
+        data = json.loads(renderers.dumps(self.payload))
+        self.assertEqual(data["amounts"], ["1.50", "2.34", "-0.00", "1000000.00", "3.10"])
+        self.assertEqual(data["utc"], "2024-01-15T09:30:01.000250Z")
+        self.assertEqual(data["offset"], "2024-03-10T01:59:00-05:00")
+        self.assertEqual(data["naive"], "2024-01-15T09:30:00")
+        self.assertEqual(data["nested"][0]["total"], "0.00")
+
+    def test_renderer_output_matches_json_renderer(self):
+        fast = renderers.FastJSONRenderer().render(self.payload, 'application/json', {})
+        stdlib = JSONRenderer()
+        stdlib.encoder_class = renderers.LedgerJSONEncoder
+        self.assertEqual(fast, stdlib.render(self.payload, 'application/json', {}))
+
+
+class SyncTests(TestCase):
+    keys = ('transactions', 'calendar_events', 'bills', 'sales', 'petty_cash')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('syncer', password='x')
+        cls.other = User.objects.create_user('sync-other', password='x')
+        create_ledger(cls.user)
+        create_ledger(cls.other)
+
+    def sync(self, since=0, **params):
+        response = client_for(self.user).get('/api/sync/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def owned(self):
+        return {
+            'transactions': set(Transaction.objects.filter(user=self.user).values_list('id', flat=True)),
+            'calendar_events': set(CalendarEvent.objects.filter(user=self.user).values_list('id', flat=True)),
+            'bills': set(Bill.objects.filter(user=self.user).values_list('id', flat=True)),
+            'sales': set(Sale.objects.filter(user=self.user).values_list('id', flat=True)),
+            'petty_cash': set(PettyCash.objects.filter(user=self.user).values_list('id', flat=True)),
+        }
+
+    def test_full_sync_returns_every_owned_row(self):
+        data = self.sync()
+        self.assertFalse(data['has_more'])
+        for key, ids in self.owned().items():
+            self.assertEqual({row['id'] for row in data[key]['changed']}, ids, key)
+            self.assertEqual(data[key]['deleted'], [])
+
+    def test_changes_and_deletes_after_the_token(self):
+        token = self.sync()['next']
+        self.assertEqual(self.sync(token)['next'], token)
+
+        edited = Bill.objects.get(user=self.user)
+        edited.is_paid = True
+        edited.save()
+        deleted = {
+            'transactions': Transaction.objects.filter(user=self.user).first(),
+            'calendar_events': CalendarEvent.objects.get(user=self.user),
+            'sales': Sale.objects.get(user=self.user),
+            'petty_cash': PettyCash.objects.get(user=self.user),
+        }
+        for row in deleted.values():
+            pk = row.pk
+            row.delete()
+            row.pk = pk
+        # Another user's changes are not reported.
+        Sale.objects.get(user=self.other).delete()
+
+        data = self.sync(token)
+        self.assertEqual([row['id'] for row in data['bills']['changed']], [edited.pk])
+        self.assertTrue(data['bills']['changed'][0]['is_paid'])
+        for key in self.keys:
+            expected = [deleted[key].pk] if key in deleted else []
+            self.assertEqual(data[key]['deleted'], expected, key)
+            if key != 'bills':
+                self.assertEqual(data[key]['changed'], [], key)
+        self.assertGreater(data['next'], token)
+
+    def test_pages_follow_next_until_has_more_is_false(self):
+        Transaction.objects.filter(user=self.user).first().delete()
+        seen, deleted, since, pages = {key: set() for key in self.keys}, set(), 0, 0
+        while True:
+            data = self.sync(since, page_size=2)
+            pages += 1
+            changes = sum(len(data[key]['changed']) + len(data[key]['deleted']) for key in self.keys)
+            self.assertLessEqual(changes, 2)
+            for key in self.keys:
+                seen[key].update(row['id'] for row in data[key]['changed'])
+            deleted.update(data['transactions']['deleted'])
+            self.assertGreater(data['next'], since)
+            since = data['next']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, self.owned())
+        self.assertEqual(len(deleted), 1)
+        self.assertEqual(pages, 4)
+
+    def test_invalid_token_is_rejected(self):
+        for since in ('abc', '-1'):
+            response = client_for(self.user).get('/api/sync/', {'since': since})
+            self.assertEqual(response.status_code, 400)
+
+
+class SyncVersionTransactionTests(TransactionTestCase):
+    def version_counter(self):
+        return Sequence.objects.filter(name='sync_version').values_list('value', flat=True).first() or 0
+
+    def test_version_is_rolled_back_with_a_failed_save(self):
+        user = User.objects.create_user('rollback', password='x')
+        before = self.version_counter()
+
+        def fail(sender, instance, **kwargs):
+            raise IntegrityError("write failed after the version was stamped")
+
+        pre_save.connect(fail, sender=Sale, dispatch_uid='test_fail_sale_save')
+        self.addCleanup(pre_save.disconnect, sender=Sale, dispatch_uid='test_fail_sale_save')
+        with self.assertRaises(IntegrityError):
+            Sale.objects.create(title="Stall", amount=Decimal('1.00'), sale_date=datetime.date(2024, 1, 1), user=user)
+        self.assertEqual(self.version_counter(), before)
+        self.assertFalse(Sale.objects.exists())
+
+
+class TimeseriesTests(TestCase):
+    url = '/api/transactions/timeseries/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('series', password='x')
+        for day, kind, amount in (
+            (datetime.date(2024, 1, 1), 'income', '100.00'),
+            (datetime.date(2024, 1, 3), 'expense', '30.00'),
+            (datetime.date(2024, 1, 4), 'income', '20.00'),
+            (datetime.date(2024, 3, 15), 'expense', '5.00'),
+        ):
+            Transaction.objects.create(title="Row", amount=Decimal(amount), transaction_type=kind, date=day, user=cls.user)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def series(self, **params):
+        response = client_for(self.user).get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_gaps_are_zero_filled_and_cumulative_starts_at_opening(self):
+        data = self.series(date_from='2024-01-02', date_to='2024-01-05')
+        self.assertEqual(data['opening'], '100.00')
+        self.assertEqual(
+            [(b['period'], b['income'], b['expense'], b['net'], b['cumulative']) for b in data['buckets']],
+            [
+                ('2024-01-02', '0.00', '0.00', '0.00', '100.00'),
+                ('2024-01-03', '0.00', '30.00', '-30.00', '70.00'),
+                ('2024-01-04', '20.00', '0.00', '20.00', '90.00'),
+                ('2024-01-05', '0.00', '0.00', '0.00', '90.00'),
+            ],
+        )
+
+    def test_unbounded_series_opens_at_zero(self):
+        data = self.series(interval='month')
+        self.assertEqual(data['opening'], '0.00')
+        self.assertEqual(
+            [(b['period'], b['net'], b['cumulative']) for b in data['buckets']],
+            [('2024-01-01', '90.00', '90.00'), ('2024-02-01', '0.00', '90.00'), ('2024-03-01', '-5.00', '85.00')],
+        )
+
+    def test_malformed_parameters_are_rejected(self):
+        client = client_for(self.user)
+        for params in ({'date_from': 'garbage'}, {'date_to': '2024-13-01'}, {'interval': 'year'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get(self.url, params).status_code, 400)
+
+
+class LedgerTests(TestCase):
+    url = '/api/transactions/ledger/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('ledger', password='x')
+        # Several rows share a date, so the pages split inside a day.
+        for day, kind, amount in (
+            (1, 'income', '100.00'), (2, 'expense', '10.00'), (2, 'expense', '15.00'), (2, 'income', '7.50'),
+            (3, 'expense', '40.00'), (5, 'income', '12.25'), (5, 'expense', '0.75'),
+        ):
+            Transaction.objects.create(
+                title=f"Day {day}", amount=Decimal(amount), transaction_type=kind, date=datetime.date(2024, 1, day), user=cls.user,
+            )
+
+    def page(self, url, **params):
+        response = client_for(self.user).get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def balances(self, page):
+        return [(row['id'], row['balance']) for row in page['results']]
+
+    def test_balances_agree_across_next_and_previous_pages(self):
+        pages = [self.page(self.url, page_size=2)]
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        self.assertEqual(len(pages), 4)
+        self.assertEqual(pages[0]['opening_balance'], '0.00')
+        for before, after in zip(pages, pages[1:]):
+            self.assertEqual(after['opening_balance'], before['closing_balance'])
+        self.assertEqual(pages[-1]['closing_balance'], '54.00')
+
+        # Walking back from the last page reproduces every earlier page.
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.page(page['previous'])
+            self.assertEqual(self.balances(page), self.balances(expected))
+            self.assertEqual(page['opening_balance'], expected['opening_balance'])
+            self.assertEqual(page['closing_balance'], expected['closing_balance'])
+
+    def test_date_filters_narrow_rows_not_balances(self):
+        page = self.page(self.url, date_from='2024-01-03', date_to='2024-01-04')
+        self.assertEqual(page['opening_balance'], '82.50')
+        self.assertEqual([row['balance'] for row in page['results']], ['42.50'])
+        self.assertEqual(page['closing_balance'], '42.50')
+
+    def test_malformed_dates_are_rejected(self):
+        client = client_for(self.user)
+        for params in ({'date_from': 'garbage'}, {'date_to': '2024-02-30'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get(self.url, params).status_code, 400)
+
+
+class CategoryBreakdownTests(TestCase):
+    url = '/api/transactions/by_category/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('categories', password='x')
+        for category, other, amount in (
+            ('food', None, '40.00'), ('transport', None, '25.00'),
+            # Free-text labels are trimmed, so both rows count as "Gifts".
+            ('other', '  Gifts ', '10.00'), ('other', 'Gifts', '5.00'),
+            # Blank or missing free text falls back to "other".
+            ('other', '   ', '6.00'), ('other', None, '6.00'),
+            ('bills', None, '8.00'),
+        ):
+            Transaction.objects.create(
+                title="Row", amount=Decimal(amount), transaction_type='expense', category=category,
+                category_other=other, date=datetime.date(2024, 1, 10), user=cls.user,
+            )
+        Transaction.objects.create(
+            title="Outside", amount=Decimal('99.00'), transaction_type='expense', category='food',
+            date=datetime.date(2023, 12, 31), user=cls.user,
+        )
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def breakdown(self, **params):
+        response = client_for(self.user).get(self.url, {'date_from': '2024-01-01', **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_labels_totals_and_shares(self):
+        data = self.breakdown()
+        self.assertEqual(data['total'], '100.00')
+        self.assertEqual(data['count'], 7)
+        self.assertEqual(
+            [(row['category'], row['total'], row['count'], row['share']) for row in data['categories']],
+            [('food', '40.00', 1, 40.0), ('transport', '25.00', 1, 25.0), ('Gifts', '15.00', 2, 15.0),
+             ('other', '12.00', 2, 12.0), ('bills', '8.00', 1, 8.0)],
+        )
+        self.assertAlmostEqual(sum(row['share'] for row in data['categories']), 100.0)
+
+    def test_top_folds_the_rest_into_others(self):
+        data = self.breakdown(top=2)
+        self.assertEqual(
+            [(row['category'], row['total'], row['count'], row['share']) for row in data['categories']],
+            [('food', '40.00', 1, 40.0), ('transport', '25.00', 1, 25.0), ('others', '35.00', 5, 35.0)],
+        )
+        self.assertEqual((data['total'], data['count']), ('100.00', 7))
+        self.assertAlmostEqual(sum(row['share'] for row in data['categories']), 100.0)
+
+    def test_malformed_parameters_are_rejected(self):
+        client = client_for(self.user)
+        for params in ({'date_from': 'garbage'}, {'date_to': '2024-1-1x'}, {'top': 'two'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get(self.url, params).status_code, 400)
+
+
+class TokenPrivilegeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('operator', password='x', is_staff=True)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.staff).access_token)
+
+    def change(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.staff.pk)
+            for name, value in fields.items():
+                setattr(user, name, value)
+            user.save()
+
+    def test_privileges_are_cached_between_requests(self):
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 200)
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get('/api/_cache/stats/').status_code, 200)
+        self.assertFalse([query for query in captured.captured_queries if 'auth_user' in query['sql']])
+
+    def test_demoted_user_loses_admin_endpoints_before_the_token_expires(self):
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 200)
+        self.change(is_staff=False)
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 403)
+        self.assertFalse(self.client.get('/api/me/').json()['is_staff'])
+
+    def test_deactivated_or_deleted_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/me/').status_code, 200)
+        self.change(is_active=False)
+        self.assertEqual(self.client.get('/api/me/').status_code, 401)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.staff.pk).delete()
+        self.assertEqual(self.client.get('/api/me/').status_code, 401)
+
+
+class OwnerScopeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('tenant-a', password='x')
+        cls.intruder = User.objects.create_user('tenant-b', password='x')
+        create_ledger(cls.owner)
+        RecurrenceRule.objects.create(
+            target='transaction', frequency='monthly', start_date=datetime.date(2024, 1, 31), title="Rent",
+            amount=Decimal('500.00'), transaction_type='expense', category='bills', user=cls.owner,
+        )
+
+    def owned_objects(self):
+        for url_prefix, viewset, basename in router.registry:
+            instance = viewset.queryset.model.objects.filter(user=self.owner).first()
+            yield url_prefix, viewset, instance, f'/api/{url_prefix}/{instance.pk}/'
+
+    def test_detail_routes_hide_other_users_rows(self):
+        intruder = client_for(self.intruder)
+        for url_prefix, viewset, instance, url in self.owned_objects():
+            with self.subTest(url=url):
+                body = client_for(self.owner).get(url).json()
+                self.assertEqual(intruder.get(url).status_code, 404)
+                self.assertEqual(intruder.put(url, body, format='json').status_code, 404)
+                self.assertEqual(intruder.patch(url, {}, format='json').status_code, 404)
+                self.assertEqual(intruder.delete(url).status_code, 404)
+                self.assertEqual(client_for(self.owner).get(url).json(), body)
+
+    def test_bulk_routes_reject_other_users_ids(self):
+        intruder = client_for(self.intruder)
+        for url_prefix, viewset, instance, url in self.owned_objects():
+            if 'bulk' not in {extra.url_path for extra in viewset.get_extra_actions()}:
+                continue
+            with self.subTest(url=url):
+                body = client_for(self.owner).get(url).json()
+                response = intruder.put(f'/api/{url_prefix}/bulk/', [body], format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), [{"id": ["Not found."]}])
+                self.assertEqual(intruder.delete(f'/api/{url_prefix}/bulk/', [instance.pk], format='json').status_code, 400)
+                self.assertEqual(client_for(self.owner).get(url).json(), body)
+
+    def owned_count(self):
+        return sum(viewset.queryset.model.objects.filter(user=self.owner).count() for _, viewset, _ in router.registry)
+
+    def test_created_rows_belong_to_the_requesting_user(self):
+        intruder = client_for(self.intruder)
+        before = self.owned_count()
+        for url_prefix, viewset, instance, url in self.owned_objects():
+            body = client_for(self.owner).get(url).json()
+            for key in ('id', 'control_number'):
+                body.pop(key, None)
+            body['user'] = self.owner.pk
+            model = viewset.queryset.model
+            with self.subTest(url=url):
+                response = intruder.post(f'/api/{url_prefix}/', body, format='json')
+                self.assertEqual(response.status_code, 201, response.content)
+                self.assertEqual(model.objects.get(pk=response.json()['id']).user, self.intruder)
+                if 'bulk' in {extra.url_path for extra in viewset.get_extra_actions()}:
+                    response = intruder.post(f'/api/{url_prefix}/bulk/', [body], format='json')
+                    self.assertEqual(response.status_code, 201, response.content)
+                    self.assertEqual(model.objects.get(pk=response.json()[0]['id']).user, self.intruder)
+        self.assertEqual(self.owned_count(), before)
+
+
+class RollupConsistencyTests(TestCase):
+    sources = {'transaction': Transaction, 'sale': Sale, 'bill': Bill, 'petty_cash': PettyCash}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rolled', password='x')
+        cls.other = User.objects.create_user('rolled-other', password='x')
+        create_ledger(cls.user)
+        create_ledger(cls.other)
+
+    def rollups(self):
+        # A rollup emptied by edits keeps its row at zero; a rebuild leaves it out.
+        return set(
+            DailyRollup.objects.exclude(count=0)
+            .values_list('user_id', 'source', 'day', 'category', 'kind', 'total', 'count')
+        )
+
+    def assertConsistent(self):
+        live = self.rollups()
+        for source, model in self.sources.items():
+            for user_id in (self.user.pk, self.other.pk):
+                rows = model.objects.filter(user_id=user_id)
+                raw = rows.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+                rolled = [row for row in live if row[0] == user_id and row[1] == source]
+                self.assertEqual(sum((row[5] for row in rolled), Decimal('0.00')), raw, source)
+                self.assertEqual(sum(row[6] for row in rolled), rows.count(), source)
+        rebuild_rollups(apps)
+        self.assertEqual(self.rollups(), live)
+
+    def test_rollups_follow_every_kind_of_write(self):
+        self.assertConsistent()
+
+        row = Transaction.objects.filter(user=self.user, transaction_type='income').get()
+        row.amount = Decimal('12.34')
+        row.save()
+        self.assertConsistent()
+        row.transaction_type = 'expense'
+        row.save()
+        self.assertConsistent()
+        row.date = datetime.date(2024, 2, 1)
+        row.category = 'food'
+        row.save()
+        self.assertConsistent()
+
+        bill = Bill.objects.get(user=self.user)
+        bill.is_paid = True
+        bill.save()
+        petty = PettyCash.objects.get(user=self.user)
+        petty.isApproved = True
+        petty.save()
+        self.assertConsistent()
+
+        Sale.objects.get(user=self.user).delete()
+        row.delete()
+        self.assertConsistent()
+
+        self.other.delete()
+        self.assertFalse(DailyRollup.objects.filter(user_id=self.other.pk).exists())
+        self.assertConsistent()
+
+    def test_rollups_follow_bulk_writes(self):
+        client = client_for(self.user)
+        created = client.post('/api/transactions/bulk/', [
+            {"title": "Bulk", "amount": "3.00", "transaction_type": "expense", "category": "food", "date": "2024-01-15"},
+            {"title": "Bulk", "amount": "4.00", "transaction_type": "income", "category": "salary", "date": "2024-01-20"},
+        ], format='json').json()
+        self.assertConsistent()
+
+        created[0].update(amount="30.00", date="2024-01-16")
+        self.assertEqual(client.put('/api/transactions/bulk/', created, format='json').status_code, 200)
+        self.assertConsistent()
+
+        self.assertEqual(client.delete('/api/transactions/bulk/', [row['id'] for row in created], format='json').status_code, 200)
+        self.assertConsistent()
+
+
+class KeysetPaginationTests(TestCase):
+    url = '/api/transactions/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pager', password='x')
+        # Runs of equal dates, so pages must split ties on id.
+        for day in (1, 2, 2, 2, 2, 3, 3, 4):
+            Transaction.objects.create(
+                title=f"Day {day}", amount=Decimal('1.00'), transaction_type='income', date=datetime.date(2024, 1, day), user=cls.user,
+            )
+        cls.expected = list(Transaction.objects.filter(user=cls.user).order_by('-date', '-id').values_list('id', flat=True))
+
+    def page(self, url, **params):
+        response = client_for(self.user).get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def test_pages_are_stable_across_equal_dates_and_new_rows(self):
+        pages = [self.page(self.url, page_size=3)]
+        # A row inserted ahead of the cursor does not shift the pages after it.
+        Transaction.objects.create(
+            title="Late", amount=Decimal('1.00'), transaction_type='income', date=datetime.date(2024, 1, 9), user=self.user,
+        )
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        self.assertEqual([self.ids(page) for page in pages], [self.expected[0:3], self.expected[3:6], self.expected[6:8]])
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_cursor_round_trips(self):
+        pages = [self.page(self.url, page_size=3)]
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.page(page['previous'])
+            self.assertEqual(self.ids(page), self.ids(expected))
+        self.assertIsNone(page['previous'])
+        self.assertEqual(self.ids(self.page(page['next'])), self.ids(pages[1]))
+
+    def test_page_size_is_capped(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'MAX_PAGE_SIZE': 5}):
+            self.assertEqual(len(self.ids(self.page(self.url, page_size=1000))), 5)
+        self.assertEqual(len(self.ids(self.page(self.url, page_size=0))), 1)
+        self.assertEqual(len(self.ids(self.page(self.url, page_size='many'))), len(self.expected))
+
+    def test_tampered_cursors_are_not_found(self):
+        def encode(data):
+            return base64.urlsafe_b64encode(data.encode()).decode()
+
+        client = client_for(self.user)
+        for cursor in ('not-base64!', encode('not json'), encode('{"v": "2024-01-02"}'),
+                       encode('{"v": "yesterday", "id": 3}'), encode('{"v": "2024-01-02", "id": "x"}')):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(client.get(self.url, {'cursor': cursor}).status_code, 404)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('exporter', password='x')
+        cls.other = User.objects.create_user('export-other', password='x')
+        create_ledger(cls.user)
+        create_ledger(cls.user, day=datetime.date(2024, 2, 10))
+        create_ledger(cls.other)
+
+    def export(self, url_prefix, **params):
+        response = client_for(self.user).get(f'/api/{url_prefix}/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def ndjson(self, url_prefix, **params):
+        return [json.loads(line) for line in self.export(url_prefix, **params).splitlines()]
+
+    def csv_rows(self, url_prefix, **params):
+        return list(csv.DictReader(io.StringIO(self.export(url_prefix, export_format='csv', **params))))
+
+    def exported_viewsets(self):
+        for url_prefix, viewset, basename in router.registry:
+            if 'export' in {extra.url_path for extra in viewset.get_extra_actions()}:
+                yield url_prefix, viewset
+
+    def test_exports_contain_every_owned_row_and_nothing_else(self):
+        for url_prefix, viewset in self.exported_viewsets():
+            owned = list(viewset.queryset.model.objects.filter(user=self.user).order_by('pk'))
+            expected = viewset.serializer_class(owned, many=True).data
+            with self.subTest(url_prefix=url_prefix):
+                self.assertEqual(self.ndjson(url_prefix), json.loads(json.dumps(expected, cls=renderers.LedgerJSONEncoder)))
+                rows = self.csv_rows(url_prefix)
+                self.assertEqual([int(row['id']) for row in rows], [instance.pk for instance in owned])
+                self.assertEqual(rows[0]['amount'], str(owned[0].amount))
+
+    def test_exports_stream_across_chunks(self):
+        with mock.patch.object(TransactionViewSet, 'export_chunk_size', 2):
+            rows = self.ndjson('transactions')
+        self.assertEqual(len(rows), Transaction.objects.filter(user=self.user).count())
+
+    def test_exports_honour_the_filters(self):
+        expected = set(
+            Transaction.objects.filter(user=self.user, transaction_type='expense', date__gte=datetime.date(2024, 2, 1))
+            .values_list('id', flat=True)
+        )
+        params = {'transaction_type': 'expense', 'date__gte': '2024-02-01'}
+        self.assertEqual(len(expected), 2)
+        self.assertEqual({row['id'] for row in self.ndjson('transactions', **params)}, expected)
+        self.assertEqual({int(row['id']) for row in self.csv_rows('transactions', **params)}, expected)
+
+    def test_unknown_format_is_rejected(self):
+        response = client_for(self.user).get('/api/transactions/export/', {'export_format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncViewParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async', password='x')
+        cls.other = User.objects.create_user('async-other', password='x')
+        today = timezone.localdate()
+        for day in (today, today, today - datetime.timedelta(days=1), today - datetime.timedelta(days=40)):
+            create_ledger(cls.user, day=day)
+        create_ledger(cls.other, day=today)
+        Bill.objects.filter(pk=Bill.objects.filter(user=cls.user).first().pk).update(is_paid=True)
+        PettyCash.objects.filter(user=cls.user).update(isApproved=True)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.user).access_token)
+
+    def async_paths(self):
+        from .urls import urlpatterns
+        for pattern in urlpatterns:
+            route = str(pattern.pattern)
+            if route.startswith('async/'):
+                yield route
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, (url, response.content))
+        return json.loads(response.content.decode().replace('/api/async/', '/api/'))
+
+    def assertSameBodies(self, query=''):
+        paths = list(self.async_paths())
+        self.assertEqual(len(paths), 14)
+        for route in paths:
+            with self.subTest(route=route, query=query):
+                self.assertEqual(self.get(f'/api/{route}{query}'), self.get(f'/api/{route[len("async/"):]}{query}'))
+
+    def test_async_endpoints_match_the_viewset_actions(self):
+        self.assertSameBodies()
+        self.assertSameBodies('?page_size=2&include=today,yesterday&date_from=2000-01-01')
+
+    @override_settings(LEDGER_ROLLUPS_ENABLED=False)
+    def test_async_endpoints_match_without_rollups(self):
+        self.assertSameBodies()
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True)
+class RequestMetricsTests(TestCase):
+    # The middleware is built when a client handler first loads its middleware,
+    # so every client here is created inside the settings override.
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('metrics', password='x')
+        cls.staff = User.objects.create_user('metrics-staff', password='x', is_staff=True)
+        create_ledger(cls.user)
+
+    def setUp(self):
+        caches['default'].clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def server_timing(self, response):
+        return dict(re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+
+    def test_server_timing_counts_the_request_queries(self):
+        client = client_for(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/transactions/', REQUIRED_PARAMS)
+        executed = len(queries.captured_queries)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.server_timing(response)), {'db', 'serialize', 'render', 'total'})
+        reported = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreater(reported, 0)
+        self.assertEqual(reported, executed)
+
+    def test_server_timing_counts_the_queries_of_a_write(self):
+        client = client_for(self.user)
+        payload = {'title': "Metered", 'amount': '1.50', 'transaction_type': 'income', 'category': 'salary', 'date': '2024-01-15'}
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/transactions/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        reported = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertEqual(reported, len(queries.captured_queries))
+
+    def test_registry_renders_prometheus_histograms(self):
+        client = client_for(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(2):
+                client.get('/api/transactions/', REQUIRED_PARAMS)
+        # Read before the next request resets connection.queries
+        executed = len(queries.captured_queries)
+        text = client_for(self.staff).get('/api/_metrics/').content.decode()
+        labels = 'view="transaction-list",method="GET"'
+        for name in ('api_request_duration_seconds', 'api_db_queries', 'api_db_duration_seconds',
+                     'api_serialize_duration_seconds', 'api_render_duration_seconds'):
+            self.assertIn(f'# TYPE {name} histogram\n', text)
+            self.assertIn(f'{name}_bucket{{{labels},le="+Inf"}} 2\n', text)
+            self.assertIn(f'{name}_count{{{labels}}} 2\n', text)
+        self.assertIn(f'api_db_queries_sum{{{labels}}} {float(executed)}\n', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for query_count in (1, 3, 300):
+            record = RequestRecord(mock.Mock(method='GET', path='/api/x/'))
+            record.view = 'x'
+            record.query_count = query_count
+            registry.observe(record)
+        text = registry.render()
+        labels = 'view="x",method="GET"'
+        self.assertIn(f'api_db_queries_bucket{{{labels},le="1"}} 1\n', text)
+        self.assertIn(f'api_db_queries_bucket{{{labels},le="2"}} 1\n', text)
+        self.assertIn(f'api_db_queries_bucket{{{labels},le="5"}} 2\n', text)
+        self.assertIn(f'api_db_queries_bucket{{{labels},le="200"}} 2\n', text)
+        self.assertIn(f'api_db_queries_bucket{{{labels},le="+Inf"}} 3\n', text)
+        self.assertIn(f'api_db_queries_sum{{{labels}}} 304.0\n', text)
+
+    def test_metrics_endpoint_requires_staff(self):
+        self.assertEqual(client_for(self.user).get('/api/_metrics/').status_code, 403)
+        response = client_for(self.staff).get('/api/_metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class CalendarRangeTests(TestCase):
+    # Local time is Asia/Manila (UTC+8), so a date bound is local midnight, not UTC midnight.
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('calendar', password='x')
+        other = User.objects.create_user('calendar-other', password='x')
+
+        def at(day, hour=0):
+            return timezone.make_aware(datetime.datetime(2024, 3, day, hour))
+
+        for title, start, end in (
+            ("spanning", at(1), at(20)),
+            ("before-inside", at(10, 22), at(11, 1)),
+            ("inside", at(11, 9), at(11, 10)),
+            ("inside-after", at(11, 23), at(13)),
+            ("ends-at-start", at(10, 23), at(11)),
+            ("starts-at-end", at(12), at(12, 1)),
+            ("earlier", at(5), at(6)),
+        ):
+            CalendarEvent.objects.create(title=title, start_date=start, end_date=end, all_day=False, user=cls.user)
+        CalendarEvent.objects.create(title="other", start_date=at(1), end_date=at(20), all_day=False, user=other)
+        cls.overlapping = ["spanning", "before-inside", "inside", "inside-after"]
+
+    def titles(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['title'] for row in response.json()['results']]
+
+    def test_range_returns_events_overlapping_the_window(self):
+        response = client_for(self.user).get('/api/calendar-events/range/', {'from': '2024-03-11', 'to': '2024-03-12'})
+        self.assertEqual(self.titles(response), self.overlapping)
+
+    def test_range_with_datetime_bounds_is_half_open(self):
+        client = client_for(self.user)
+        response = client.get('/api/calendar-events/range/', {'from': '2024-03-11T09:30', 'to': '2024-03-11T09:45'})
+        self.assertEqual(self.titles(response), ["spanning", "inside"])
+        response = client.get('/api/calendar-events/range/', {'from': '2024-03-11T10:00', 'to': '2024-03-11T11:00'})
+        self.assertEqual(self.titles(response), ["spanning"])
+
+    def test_range_rejects_missing_malformed_and_reversed_bounds(self):
+        client = client_for(self.user)
+        for params, field in (
+            ({'to': '2024-03-12'}, 'from'),
+            ({'from': '2024-03-11'}, 'to'),
+            ({'from': '11/03/2024', 'to': '2024-03-12'}, 'from'),
+            ({'from': '2024-03-11', 'to': '2024-02-30'}, 'to'),
+            ({'from': '2024-03-12', 'to': '2024-03-11'}, 'to'),
+            ({'from': '2024-03-11', 'to': '2024-03-11'}, 'to'),
+        ):
+            with self.subTest(params=params):
+                response = client.get('/api/calendar-events/range/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json())
+
+    def test_todays_events_uses_the_local_day(self):
+        # 2024-03-10 19:00 UTC is 03:00 on the 11th in Manila; today's events list latest first
+        now = datetime.datetime(2024, 3, 10, 19, tzinfo=datetime.timezone.utc)
+        client = APIClient()
+        client.cookies['access_token'] = str(tokens_for_user(self.user).access_token)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            for url in ('/api/calendar-events/todays_events/', '/api/async/calendar-events/todays_events/'):
+                with self.subTest(url=url):
+                    self.assertEqual(self.titles(client.get(url)), self.overlapping[::-1])
+
+
+class RecurrenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('recurring', password='x')
+        cls.rent = RecurrenceRule.objects.create(
+            target='transaction', frequency='monthly', start_date=datetime.date(2024, 1, 31), title="Rent",
+            amount=Decimal('500.00'), transaction_type='expense', category='bills', user=cls.user,
+        )
+        cls.water = RecurrenceRule.objects.create(
+            target='bill', frequency='weekly', interval=2, start_date=datetime.date(2024, 1, 1), title="Water",
+            amount=Decimal('12.50'), user=cls.user,
+        )
+
+    def snapshot(self):
+        return (
+            sorted(Transaction.objects.values_list('recurrence_id', 'recurrence_date', 'date', 'amount')),
+            sorted(Bill.objects.values_list('recurrence_id', 'recurrence_date', 'due_date', 'amount')),
+            sorted(DailyRollup.objects.values_list('source', 'day', 'kind', 'total', 'count')),
+            sorted(RecurrenceRule.objects.values_list('pk', 'occurrences', 'next_date')),
+        )
+
+    def test_monthly_rule_on_the_31st_clamps_to_month_end(self):
+        materialize_recurrences(datetime.date(2024, 6, 30))
+        self.assertEqual(
+            list(Transaction.objects.filter(recurrence=self.rent).order_by('date').values_list('date', flat=True)),
+            [datetime.date(2024, 1, 31), datetime.date(2024, 2, 29), datetime.date(2024, 3, 31),
+             datetime.date(2024, 4, 30), datetime.date(2024, 5, 31), datetime.date(2024, 6, 30)],
+        )
+        self.rent.refresh_from_db()
+        self.assertEqual(self.rent.next_date, datetime.date(2024, 7, 31))
+        rule = RecurrenceRule(frequency='monthly', interval=1, start_date=datetime.date(2023, 1, 31))
+        self.assertEqual(rule.occurrence_date(1), datetime.date(2023, 2, 28))
+        self.assertEqual(rule.occurrence_date(13), datetime.date(2024, 2, 29))
+
+    def test_materializing_twice_is_idempotent(self):
+        until = datetime.date(2024, 3, 31)
+        self.assertEqual(materialize_recurrences(until, batch_size=1), (2, 3 + 7))
+        first = self.snapshot()
+        self.assertEqual(materialize_recurrences(until, batch_size=1), (0, 0))
+        self.assertEqual(self.snapshot(), first)
+
+    def test_rerun_after_an_interrupted_run_skips_written_occurrences(self):
+        until = datetime.date(2024, 3, 31)
+        materialize_recurrences(until)
+        first = self.snapshot()
+        # As if the rows were committed but the rules were not advanced
+        RecurrenceRule.objects.update(occurrences=0, next_date=F('start_date'))
+        self.assertEqual(materialize_recurrences(until), (2, 0))
+        self.assertEqual(self.snapshot(), first)
+
+
+class LedgerTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('totals', password='x')
+        other = User.objects.create_user('totals-other', password='x')
+        cls.today = timezone.localdate()
+        for days_ago, kind, amount in (
+            (0, 'income', '100.25'), (0, 'expense', '40.00'), (0, 'expense', '0.75'),
+            (1, 'income', '10.00'), (1, 'expense', '55.50'),
+            (10, 'income', '1000.00'), (10, 'expense', '1.00'),
+            (-1, 'income', '7.00'),
+        ):
+            Transaction.objects.create(
+                title=kind, amount=Decimal(amount), transaction_type=kind, category='other',
+                date=cls.today - datetime.timedelta(days=days_ago), user=cls.user,
+            )
+        Transaction.objects.create(title="other", amount=Decimal('999.00'), transaction_type='income',
+                                   category='other', date=cls.today, user=other)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def per_window_totals(self, date_from, date_to):
+        # What the endpoints computed before: one aggregate per transaction type and a count.
+        rows = Transaction.objects.filter(date_window('date', date_from, date_to), user=self.user)
+        income = rows.filter(transaction_type='income').aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        expense = rows.filter(transaction_type='expense').aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        return {"total_income": income, "total_expense": expense, "balance": income - expense, "count": rows.count()}
+
+    def get(self, url):
+        client = client_for(self.user)
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assertTotals(self, data, date_from, date_to):
+        expected = self.per_window_totals(date_from, date_to)
+        self.assertEqual(
+            {key: Decimal(str(data[key])) if key != 'count' else data[key] for key in expected}, expected,
+        )
+
+    def assertSummaryEndpoints(self):
+        yesterday = self.today - datetime.timedelta(days=1)
+        data = self.get('/api/transactions/summary/?include=today,yesterday')
+        self.assertTotals(data, None, self.today)
+        self.assertTotals(data['today'], self.today, self.today)
+        self.assertTotals(data['yesterday'], yesterday, yesterday)
+        data = self.get(f'/api/transactions/summary/?date_from={yesterday}&date_to={self.today}')
+        self.assertTotals(data, yesterday, self.today)
+        self.assertTotals(self.get('/api/transactions/today_total_transactions/'), self.today, self.today)
+        self.assertTotals(self.get('/api/transactions/yesterday_total_transactions/'), yesterday, yesterday)
+
+    def test_summary_endpoints_run_one_query_from_rollups(self):
+        self.assertSummaryEndpoints()
+
+    @override_settings(LEDGER_ROLLUPS_ENABLED=False)
+    def test_summary_endpoints_run_one_query_from_rows(self):
+        self.assertSummaryEndpoints()
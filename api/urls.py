@@ -1,11 +1,14 @@
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet, me_view, logout_view, CalendarEventViewSet, PettyCashViewSet, BillViewSet, SaleViewSet
+from .views import TransactionViewSet, me_view, logout_view, cache_stats_view, metrics_view, CalendarEventViewSet, PettyCashViewSet, BillViewSet, SaleViewSet, RecurrenceRuleViewSet
 from django.urls import path
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
     TokenVerifyView,
 )
 from api.views import LoginView
+from api import async_views
+from api.dashboard import dashboard_view
+from api.sync import sync_view
 
 router = DefaultRouter()
 router.register(r'transactions', TransactionViewSet, basename='transaction')
@@ -13,6 +16,7 @@ router.register(r'calendar-events', CalendarEventViewSet, basename='calendar-eve
 router.register(r'petty-cash', PettyCashViewSet, basename='petty-cash')
 router.register(r'bills', BillViewSet, basename='bill')
 router.register(r'sales', SaleViewSet, basename='sale')
+router.register(r'recurrences', RecurrenceRuleViewSet, basename='recurrence')
 
 
 urlpatterns = router.urls
@@ -20,7 +24,29 @@ urlpatterns = router.urls
 urlpatterns += [
     path("me/", me_view, name="me"),
     path("logout/", logout_view, name="logout"),
+    path("_cache/stats/", cache_stats_view, name="cache_stats"),
+    path("_metrics/", metrics_view, name="metrics"),
+    path("dashboard/", dashboard_view, name="dashboard"),
+    path("sync/", sync_view, name="sync"),
     path('token/', LoginView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
-]
\ No newline at end of file
+]
+
+# ASGI-native read-only endpoints; same payloads as the matching ViewSet actions.
+urlpatterns += [
+    path("async/me/", async_views.me_view, name="async_me"),
+    path("async/transactions/summary/", async_views.transaction_summary, name="async_transaction_summary"),
+    path("async/transactions/today_total_transactions/", async_views.today_total_transactions, name="async_today_total_transactions"),
+    path("async/transactions/yesterday_total_transactions/", async_views.yesterday_total_transactions, name="async_yesterday_total_transactions"),
+    path("async/transactions/todays_transactions/", async_views.todays_transactions, name="async_todays_transactions"),
+    path("async/sales/total_sales/", async_views.total_sales, name="async_total_sales"),
+    path("async/sales/todays_sales/", async_views.todays_sales, name="async_todays_sales"),
+    path("async/bills/total_bills/", async_views.total_bills, name="async_total_bills"),
+    path("async/bills/total_paid_bills/", async_views.total_paid_bills, name="async_total_paid_bills"),
+    path("async/bills/total_unpaid_bills/", async_views.total_unpaid_bills, name="async_total_unpaid_bills"),
+    path("async/bills/todays_bills/", async_views.todays_bills, name="async_todays_bills"),
+    path("async/petty-cash/total_petty_cash/", async_views.total_petty_cash, name="async_total_petty_cash"),
+    path("async/petty-cash/todays_petty_cash/", async_views.todays_petty_cash, name="async_todays_petty_cash"),
+    path("async/calendar-events/todays_events/", async_views.todays_events, name="async_todays_events"),
+]
@@ -0,0 +1,43 @@
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def local_bound(value):
+    """
+    Parse a ``YYYY-MM-DD`` or ISO 8601 datetime query parameter into an aware
+    datetime; dates and naive datetimes are read in the current time zone.
+    Returns ``None`` when ``value`` is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.datetime.combine(day, datetime.time())
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def day_span(day):
+    """``[start, end)`` of a local calendar day as aware datetimes."""
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+    end = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time()))
+    return start, end
+
+
+def overlapping(start, end):
+    """
+    Q for events that overlap ``[start, end)``, including ones that began
+    earlier and are still running. Both comparisons are on the bare columns,
+    so the ``(user, start_date, end_date)`` index serves them.
+    """
+    return Q(start_date__lt=end, end_date__gt=start)
@@ -0,0 +1,139 @@
+import datetime
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import relations, serializers
+from rest_framework.settings import api_settings
+
+from .fields import LocalDateTimeField
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+class _OffsetCache:
+    """
+    UTC offset of the current timezone memoized per UTC hour, so each value
+    costs a dict lookup instead of a zoneinfo conversion. Hours with a
+    transition in them (which need not fall on the hour, as in
+    Australia/Lord_Howe) are memoized as ``None`` and converted per value.
+    """
+
+    def __init__(self, tz):
+        self.tz = tz
+        self.offsets = {}
+
+    def hour_offset(self, hour):
+        """The fixed offset for all of ``hour`` (naive UTC), or ``None`` if it changes during it."""
+        start = hour.replace(tzinfo=datetime.timezone.utc)
+        first = start.astimezone(self.tz).utcoffset()
+        last = (start + datetime.timedelta(hours=1, microseconds=-1)).astimezone(self.tz).utcoffset()
+        return datetime.timezone(first) if first == last else None
+
+    def isoformat(self, value):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, self.tz)
+        value = value.astimezone(datetime.timezone.utc)
+        hour = value.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        try:
+            fixed = self.offsets[hour]
+        except KeyError:
+            fixed = self.offsets[hour] = self.hour_offset(hour)
+        text = value.astimezone(self.tz if fixed is None else fixed).isoformat()
+        if text.endswith('+00:00'):
+            text = text[:-6] + 'Z'
+        return text
+
+
+def _decimal_converter(field):
+    if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        raise UnsupportedField(field)
+    if field.localize or field.normalize_output:
+        raise UnsupportedField(field)
+    if field.decimal_places is None:
+        return lambda value: '{:f}'.format(value)
+
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _converter(field, offsets):
+    """Value converter matching ``field.to_representation`` for ISO-formatted output."""
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            raise UnsupportedField(field)
+        return None
+    if isinstance(field, serializers.ChoiceField):
+        return str
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        if not isinstance(field, LocalDateTimeField) and type(field) is not serializers.DateTimeField:
+            raise UnsupportedField(field)
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() != 'iso-8601':
+            raise UnsupportedField(field)
+        return offsets.isoformat
+    if isinstance(field, serializers.DateField):
+        if getattr(field, 'format', api_settings.DATE_FORMAT).lower() != 'iso-8601':
+            raise UnsupportedField(field)
+        return datetime.date.isoformat
+    simple = {serializers.CharField: str, serializers.IntegerField: int, serializers.BooleanField: bool}
+    if type(field) in simple:
+        return simple[type(field)]
+    raise UnsupportedField(field)
+
+
+class FastListSerializer:
+    """
+    Read-only list serialization straight from ``values()`` rows. Built from
+    a ``ModelSerializer`` instance and produces the same output as its
+    ``many=True`` representation without instantiating models or running
+    per-field ``to_representation``. ``build`` returns ``None`` when the
+    serializer has a field this fast path does not reproduce exactly.
+    """
+
+    def __init__(self, columns, plan):
+        self.columns = columns
+        self.plan = plan
+
+    @classmethod
+    def build(cls, serializer):
+        model = serializer.Meta.model
+        offsets = _OffsetCache(timezone.get_current_timezone())
+        columns, plan = [], []
+        try:
+            for name, field in serializer.fields.items():
+                if field.write_only:
+                    continue
+                if field.source == '*' or '.' in field.source:
+                    raise UnsupportedField(field)
+                column = model._meta.get_field(field.source).attname
+                columns.append(column)
+                plan.append((name, column, _converter(field, offsets)))
+        except (UnsupportedField, FieldDoesNotExist):
+            return None
+        return cls(columns, plan)
+
+    def prepare(self, queryset):
+        return queryset.values(*self.columns)
+
+    def serialize(self, rows):
+        plan = self.plan
+        return [
+            {
+                name: (None if row[column] is None else (convert(row[column]) if convert else row[column]))
+                for name, column, convert in plan
+            }
+            for row in rows
+        ]
@@ -0,0 +1,40 @@
+import re
+
+from django.db import connection
+
+# Plan lines that mean a whole table was read without an index.
+FULL_SCAN_PATTERNS = (
+    re.compile(r'\bSCAN (api_\w+)\b(?! USING)'),  # SQLite
+    re.compile(r'Seq Scan on (api_\w+)'),        # PostgreSQL
+    re.compile(r'\btype: ALL\b.*table: (api_\w+)'),
+)
+
+# Plan lines naming the index a table was read through.
+INDEX_PATTERNS = (
+    re.compile(r'\bUSING (?:COVERING )?INDEX (\w+)'),  # SQLite
+    re.compile(r'Index (?:Only )?Scan(?: Backward)? using (\w+)'),  # PostgreSQL
+    re.compile(r'\bkey: (\w+)'),  # MySQL
+)
+
+
+def query_plan(sql):
+    """EXPLAIN output for ``sql``, as captured by ``CaptureQueriesContext``, one line per row."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def full_scans(plan):
+    return sorted({table for pattern in FULL_SCAN_PATTERNS for table in pattern.findall(plan)})
+
+
+def indexes_used(plan):
+    return sorted({name for pattern in INDEX_PATTERNS for name in pattern.findall(plan)})
+
+
+def api_reads(captured_queries):
+    """SELECTs against the app's tables among ``captured_queries``."""
+    for query in captured_queries:
+        sql = query['sql']
+        if sql.lstrip().upper().startswith('SELECT') and 'api_' in sql:
+            yield sql
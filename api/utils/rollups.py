@@ -0,0 +1,59 @@
+from django.db.models import Case, CharField, Count, F, Sum, Value, When
+
+BATCH_SIZE = 1000
+
+
+def _sources():
+    # (source, model name, date field, category expression, kind expression)
+    return (
+        ('transaction', 'Transaction', 'date', F('category'), F('transaction_type')),
+        ('sale', 'Sale', 'sale_date', Value(''), Value('sale')),
+        ('bill', 'Bill', 'due_date', Value(''),
+         Case(When(is_paid=True, then=Value('paid')), default=Value('unpaid'), output_field=CharField())),
+        ('petty_cash', 'PettyCash', 'date', Value(''),
+         Case(When(isApproved=True, then=Value('approved')), default=Value('pending'), output_field=CharField())),
+    )
+
+
+def rebuild_rollups(apps, user_ids=None):
+    """
+    Recompute ``DailyRollup`` from the raw ledger tables with one GROUP BY
+    per source. ``apps`` is an app registry, so this also runs inside
+    migrations. Returns the number of rollup rows written.
+    """
+    DailyRollup = apps.get_model('api', 'DailyRollup')
+    existing = DailyRollup.objects.all()
+    if user_ids is not None:
+        existing = existing.filter(user_id__in=user_ids)
+    existing.delete()
+
+    written = 0
+    for source, model_name, date_field, category, kind in _sources():
+        rows = apps.get_model('api', model_name).objects.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        groups = (
+            rows.order_by()
+            .annotate(rollup_day=F(date_field), rollup_category=category, rollup_kind=kind)
+            .values('user_id', 'rollup_day', 'rollup_category', 'rollup_kind')
+            .annotate(rollup_total=Sum('amount'), rollup_count=Count('id'))
+        )
+        batch = []
+        for group in groups.iterator(chunk_size=BATCH_SIZE):
+            batch.append(DailyRollup(
+                user_id=group['user_id'],
+                source=source,
+                day=group['rollup_day'],
+                category=group['rollup_category'],
+                kind=group['rollup_kind'],
+                total=group['rollup_total'],
+                count=group['rollup_count'],
+            ))
+            if len(batch) >= BATCH_SIZE:
+                DailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            DailyRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
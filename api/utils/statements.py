@@ -0,0 +1,166 @@
+"""
+Streaming readers for bank statements. ``statement_rows`` yields one dict
+per transaction from a binary file object, reading it in fixed-size pieces,
+so memory stays flat however long the statement is. Nothing here touches
+the database; ``api.imports`` validates and writes the rows.
+"""
+import codecs
+import csv
+import hashlib
+import io
+import re
+from decimal import Decimal, InvalidOperation
+
+CENT = Decimal('0.01')
+READ_SIZE = 64 * 1024
+
+# Lower-cased CSV header -> Transaction field.
+CSV_COLUMNS = {
+    'date': 'date', 'posted': 'date', 'posting date': 'date', 'transaction date': 'date',
+    'title': 'title', 'description': 'title', 'payee': 'title', 'name': 'title', 'details': 'title',
+    'amount': 'amount',
+    'debit': 'debit', 'withdrawal': 'debit',
+    'credit': 'credit', 'deposit': 'credit',
+    'type': 'transaction_type', 'transaction_type': 'transaction_type',
+    'category': 'category',
+    'memo': 'description', 'notes': 'description',
+}
+
+_OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+_OFX_END = re.compile(r'</STMTTRN>', re.IGNORECASE)
+
+
+class StatementError(Exception):
+    pass
+
+
+def content_hash(user_id, date, amount, title):
+    """
+    Fingerprint of a transaction for import dedupe: owner, ISO date, signed
+    amount to the cent, and the title case-folded with whitespace collapsed.
+    """
+    title = ' '.join(str(title or '').split()).casefold()
+    amount = Decimal(str(amount)).quantize(CENT)
+    text = f"{user_id or ''}|{date.isoformat()}|{amount}|{title}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _amount(value):
+    text = (value or '').strip().replace(',', '')
+    negative = text.startswith('(') and text.endswith(')')
+    text = text.strip('()')
+    if not text:
+        return None
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise StatementError(f"Invalid amount {value!r}.")
+    return -amount if negative else amount
+
+
+def _signed_row(date, title, amount, **extra):
+    """Row in serializer terms; a negative amount without an explicit type is an expense."""
+    row = {"date": date, "title": title, **{k: v for k, v in extra.items() if v}}
+    if amount is None:
+        raise StatementError("Missing amount.")
+    if 'transaction_type' not in row:
+        row['transaction_type'] = 'expense' if amount < 0 else 'income'
+    row['amount'] = str(abs(amount))
+    return row
+
+
+def read_csv(stream, encoding='utf-8-sig'):
+    """
+    Rows of a CSV statement with a header line. A signed ``amount`` column,
+    or separate ``debit``/``credit`` columns, gives the amount.
+    Yields ``(line number, row or StatementError)``.
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    reader = csv.reader(text)
+    try:
+        header = next(reader)
+    except StopIteration:
+        return
+    columns = [CSV_COLUMNS.get(name.strip().lower()) for name in header]
+    if 'date' not in columns or 'title' not in columns or not {'amount', 'debit', 'credit'} & set(columns):
+        raise StatementError("CSV header needs date, title/description and amount (or debit/credit) columns.")
+    for record in reader:
+        if not any(cell.strip() for cell in record):
+            continue
+        values = {column: cell.strip() for column, cell in zip(columns, record) if column}
+        try:
+            amount = _amount(values.pop('amount', None))
+            if amount is None:
+                credit, debit = _amount(values.pop('credit', None)), _amount(values.pop('debit', None))
+                if credit or debit:
+                    amount = (credit or 0) - abs(debit or 0)
+            values.pop('credit', None), values.pop('debit', None)
+            yield reader.line_num, _signed_row(amount=amount, **values)
+        except (StatementError, TypeError) as exc:
+            yield reader.line_num, StatementError(str(exc))
+
+
+def _ofx_date(value):
+    # DTPOSTED is YYYYMMDD, optionally followed by a time and a [zone] suffix.
+    digits = value.strip()[:8]
+    if len(digits) != 8 or not digits.isdigit():
+        raise StatementError(f"Invalid DTPOSTED {value!r}.")
+    return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}"
+
+
+def _ofx_transaction(block):
+    fields = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(block)}
+    title = fields.get('NAME') or fields.get('PAYEE') or fields.get('MEMO')
+    description = fields.get('MEMO') if fields.get('NAME') else None
+    return _signed_row(
+        date=_ofx_date(fields.get('DTPOSTED', '')), title=title,
+        amount=_amount(fields.get('TRNAMT')), description=description,
+    )
+
+
+def read_ofx(stream, encoding='latin-1'):
+    """
+    ``<STMTTRN>`` records of an OFX 1.x (SGML) or 2.x (XML) statement, cut
+    out of the byte stream as they complete. Yields ``(record number, row or
+    StatementError)``.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    buffer, number = '', 0
+    while True:
+        piece = stream.read(READ_SIZE)
+        buffer += decoder.decode(piece, final=not piece)
+        while True:
+            end = _OFX_END.search(buffer)
+            if end is None:
+                break
+            block, buffer = buffer[:end.start()], buffer[end.end():]
+            start = block.upper().rfind('<STMTTRN>')
+            if start < 0:
+                continue
+            number += 1
+            try:
+                yield number, _ofx_transaction(block[start:])
+            except StatementError as exc:
+                yield number, exc
+        if not piece:
+            return
+        # Keep only a possible unfinished record.
+        start = buffer.upper().rfind('<STMTTRN>')
+        buffer = buffer[start:] if start >= 0 else buffer[-len('<STMTTRN>'):]
+
+
+READERS = {'csv': read_csv, 'ofx': read_ofx}
+
+
+def statement_format(name, requested=None):
+    """``csv`` or ``ofx`` from an explicit choice or the file extension."""
+    choice = (requested or name.rsplit('.', 1)[-1]).lower()
+    if choice == 'qfx':
+        choice = 'ofx'
+    if choice not in READERS:
+        raise StatementError(f"Unsupported statement format {choice!r}; use csv or ofx.")
+    return choice
+
+
+def statement_rows(stream, statement_format):
+    return READERS[statement_format](stream)
@@ -0,0 +1,248 @@
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, Count, DecimalField, F, FloatField, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf, Round, Trim
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+ZERO = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def date_window(field, date_from=None, date_to=None):
+    """Q for ``date_from <= field <= date_to``; either bound may be open."""
+    window = Q()
+    if date_from is not None:
+        window &= Q(**{f'{field}__gte': date_from})
+    if date_to is not None:
+        window &= Q(**{f'{field}__lte': date_to})
+    return window
+
+
+def day_param(value, default):
+    """Parse a ``YYYY-MM-DD`` query parameter, falling back to ``default``."""
+    if value:
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            return parsed
+    return default
+
+
+def date_bound(params, name):
+    """Optional ``YYYY-MM-DD`` query parameter ``name``; malformed input is a 400."""
+    value = params.get(name)
+    day = day_param(value, None)
+    if value and day is None:
+        raise ValidationError({name: "Use a YYYY-MM-DD date."})
+    return day
+
+
+def summary_windows(params, today):
+    """
+    Windows for the summary endpoints: ``range`` from ``date_from``/``date_to``
+    (everything up to today when neither is given), plus ``today`` and
+    ``yesterday`` when listed in ``?include=``.
+    """
+    date_from = date_bound(params, 'date_from')
+    date_to = date_bound(params, 'date_to')
+    if date_from or date_to:
+        windows = {"range": (date_from, date_to)}
+    else:
+        windows = {"range": (None, today)}
+
+    include = params.get('include', '')
+    for name in filter(None, (part.strip() for part in include.split(','))):
+        if name == "today":
+            windows["today"] = (today, today)
+        elif name == "yesterday":
+            yesterday = today - timedelta(days=1)
+            windows["yesterday"] = (yesterday, yesterday)
+    return windows
+
+
+def summary_response(totals):
+    data = dict(totals.pop("range"))
+    data.update(totals)
+    return data
+
+
+def _filtered(condition):
+    # An empty Q is not a valid aggregate filter.
+    return condition if condition else None
+
+
+def totals_aggregates(windows, date_field='date', amount_field='amount', type_field='transaction_type',
+                      count_field=None, scope=None):
+    """
+    Conditional aggregates for ``ledger_totals``, exposed so callers can fold
+    them into a larger ``aggregate()`` call. ``scope`` is ANDed into every
+    window. Returns ``(conditions, aggregates)``.
+    """
+    conditions = {}
+    for name, bounds in windows.items():
+        window = date_window(date_field, *bounds)
+        conditions[name] = scope & window if scope else window
+
+    aggregates = {}
+    for name, window in conditions.items():
+        income = window & Q(**{type_field: 'income'})
+        expense = window & Q(**{type_field: 'expense'})
+        aggregates[f'{name}_income'] = Coalesce(Sum(amount_field, filter=income), ZERO)
+        aggregates[f'{name}_expense'] = Coalesce(Sum(amount_field, filter=expense), ZERO)
+        if count_field:
+            aggregates[f'{name}_count'] = Coalesce(Sum(count_field, filter=_filtered(window)), 0)
+        else:
+            aggregates[f'{name}_count'] = Count('pk', filter=_filtered(window))
+    return conditions, aggregates
+
+
+def _totals_query(queryset, windows, date_field, amount_field, type_field, count_field):
+    conditions, aggregates = totals_aggregates(windows, date_field, amount_field, type_field, count_field)
+    # Narrow the scan to rows that fall in at least one window.
+    if all(conditions.values()):
+        queryset = queryset.filter(reduce(or_, conditions.values()))
+    return queryset, aggregates
+
+
+def totals_result(windows, row):
+    totals = {}
+    for name in windows:
+        income = row[f'{name}_income']
+        expense = row[f'{name}_expense']
+        totals[name] = {
+            "total_income": income,
+            "total_expense": expense,
+            "balance": income - expense,
+            "count": row[f'{name}_count'],
+        }
+    return totals
+
+
+def ledger_totals(queryset, windows, date_field='date', amount_field='amount',
+                  type_field='transaction_type', count_field=None):
+    """
+    Income, expense, balance and row count for each named window, computed
+    with one conditional-aggregation query. ``windows`` maps a name to a
+    ``(date_from, date_to)`` pair, e.g. ``{"today": (today, today)}``.
+
+    ``count_field`` sums a stored count column instead of counting rows, so
+    the same query works against pre-aggregated tables.
+    """
+    if not windows:
+        return {}
+    queryset, aggregates = _totals_query(queryset, windows, date_field, amount_field, type_field, count_field)
+    return totals_result(windows, queryset.aggregate(**aggregates))
+
+
+async def aledger_totals(queryset, windows, date_field='date', amount_field='amount',
+                         type_field='transaction_type', count_field=None):
+    """Async counterpart of ``ledger_totals``."""
+    if not windows:
+        return {}
+    queryset, aggregates = _totals_query(queryset, windows, date_field, amount_field, type_field, count_field)
+    return totals_result(windows, await queryset.aaggregate(**aggregates))
+
+
+ROLLUP_FIELDS = {"date_field": 'day', "amount_field": 'total', "type_field": 'kind', "count_field": 'count'}
+
+
+def transaction_totals(queryset, windows):
+    return ledger_totals(queryset, windows)
+
+
+def rollup_totals(queryset, windows):
+    return ledger_totals(queryset, windows, **ROLLUP_FIELDS)
+
+
+async def atransaction_totals(queryset, windows):
+    return await aledger_totals(queryset, windows)
+
+
+async def arollup_totals(queryset, windows):
+    return await aledger_totals(queryset, windows, **ROLLUP_FIELDS)
+
+
+def signed_amount(amount_field='amount', type_field='transaction_type'):
+    """Income as a positive and expenses as a negative amount."""
+    return Case(
+        When(**{type_field: 'income'}, then=F(amount_field)),
+        When(**{type_field: 'expense'}, then=-F(amount_field)),
+        default=ZERO,
+        output_field=ZERO.output_field,
+    )
+
+
+def opening_balance(queryset, day, pk, rollups=None, inclusive=False):
+    """
+    Net of ``queryset`` rows before ``(day, pk)`` in ledger order, or up to and
+    including it with ``inclusive``. Earlier history is one seek on the
+    ``(user, date)`` index; with ``rollups`` those days come from the daily
+    rollups and only ``day``'s own rows are read.
+    """
+    if day is None:
+        return Decimal('0.00')
+    same_day = Q(date=day, **{'id__lte' if inclusive else 'id__lt': pk})
+    if rollups is None:
+        rows = queryset.filter(Q(date__lt=day) | same_day)
+    else:
+        rows = queryset.filter(same_day)
+    balance = rows.order_by().aggregate(balance=Coalesce(Sum(signed_amount()), ZERO))['balance']
+    if rollups is not None:
+        earlier = rollups.filter(day__lt=day).order_by().aggregate(
+            balance=Coalesce(Sum(signed_amount('total', 'kind')), ZERO)
+        )['balance']
+        balance += earlier
+    return balance
+
+
+def category_label():
+    """Category choice key, or the trimmed free-text ``category_other`` for rows filed under "other"."""
+    custom = NullIf(Trim('category_other'), Value(''))
+    return Case(
+        When(category='other', category_other__isnull=False, then=Coalesce(custom, Value('other'))),
+        default=F('category'),
+    )
+
+
+def category_breakdown(queryset, top=None):
+    """
+    Sum, count and percentage share of the total per category label, in one
+    GROUP BY query; the grand total is an uncorrelated subquery. With
+    ``top`` the remaining categories are folded into an "others" entry.
+    """
+    queryset = queryset.order_by()
+    grand_total = Subquery(
+        queryset.annotate(everything=Value(1)).values('everything').annotate(total=Sum('amount')).values('total')
+    )
+    share = Round(Cast(F('total'), FloatField()) * 100.0 / NullIf(Cast(grand_total, FloatField()), 0.0), 2)
+    rows = list(
+        queryset.annotate(label=category_label())
+        .values('label')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .annotate(share=Coalesce(share, 0.0))
+        .order_by('-total', 'label')
+    )
+    categories = [
+        {"category": row['label'], "total": row['total'], "count": row['count'], "share": row['share']}
+        for row in rows
+    ]
+
+    if top is not None and len(categories) > top:
+        rest = categories[top:]
+        categories = categories[:top] + [{
+            "category": "others",
+            "total": sum(row['total'] for row in rest),
+            "count": sum(row['count'] for row in rest),
+            "share": round(sum(row['share'] for row in rest), 2),
+        }]
+
+    return {
+        "total": sum(row['total'] for row in categories) if categories else ZERO.value,
+        "count": sum(row['count'] for row in categories),
+        "categories": categories,
+    }
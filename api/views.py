@@ -1,20 +1,34 @@
+import logging
+
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from django.db.models import Sum
-from .models import CalendarEvent, Transaction, PettyCash, Bill, Sale
-from .serializers import TransactionSerializer, CalendarEventSerializer, PettyCashSerializer, BillSerializer, SaleSerializer
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from .models import CalendarEvent, Transaction, PettyCash, Bill, Sale, RecurrenceRule, allocate_control_numbers
+from .serializers import TransactionSerializer, CalendarEventSerializer, PettyCashSerializer, BillSerializer, SaleSerializer, RecurrenceRuleSerializer
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
+from django.http import HttpResponse
 from django.contrib.auth import authenticate
 from rest_framework.decorators import api_view, permission_classes
 from django.utils import timezone
 from datetime import timedelta
+from django.db.models import F, Q, RowRange, Sum, Window
 from django.utils.timezone import localtime
-from django.utils.dateparse import parse_date
 from .permissions import IsSuperAdminOrOwner
+from .cache import cache_stats, cached_aggregate
+from .metrics import registry, timed
+from .authentication import revoke_token, tokens_for_user
+from .imports import import_statement
 from django_filters import rest_framework as filters
+from .mixins import AtomicWritesMixin, OwnerScopedMixin, BulkMixin, ExportMixin, PaginatedActionMixin, RollupTotalsMixin, TimeseriesMixin
+from .utils.events import day_span, local_bound, overlapping
+from .utils.statements import StatementError, statement_format
+from .utils.totals import category_breakdown, date_bound, date_window, day_param, opening_balance, rollup_totals, signed_amount, summary_response, summary_windows, transaction_totals
+
+logger = logging.getLogger(__name__)
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -34,15 +48,30 @@ def logout_view(request):
     refresh_token = request.COOKIES.get("refresh_token")
     if refresh_token:
         try:
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-        except Exception as e:
-            print(f"Error blacklisting token: {str(e)}")
+            revoke_token(RefreshToken(refresh_token))
+        except Exception:
+            logger.exception("Error blacklisting refresh token")
+    access_token = request.COOKIES.get("access_token")
+    if access_token:
+        try:
+            revoke_token(AccessToken(access_token))
+        except Exception:
+            logger.exception("Error revoking access token")
     response = Response({"message": "Logged out"})
-    response.delete_cookie("access_token", samesite="None", secure=True)
-    response.delete_cookie("refresh_token", samesite="None", secure=True)
+    response.delete_cookie("access_token", samesite="None")
+    response.delete_cookie("refresh_token", samesite="None")
     return response
 
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats_view(request):
+    return Response(cache_stats())
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 class LoginView(APIView):
     def post(self, request):
         username = request.data.get("username")
@@ -52,7 +81,7 @@ class LoginView(APIView):
         if user is None:
             return Response({"error": "Invalid credentials"}, status=401)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         response = Response({"message": "Login successful"})
 
         # Set httpOnly cookies
@@ -74,10 +103,12 @@ class LoginView(APIView):
         return response
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(AtomicWritesMixin, OwnerScopedMixin, TimeseriesMixin, BulkMixin, ExportMixin, PaginatedActionMixin, RollupTotalsMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all().order_by('-date')
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    rollup_source = 'transaction'
+    keyset_ordering = '-date'
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_fields = {
         'transaction_type': ['exact'],
@@ -85,23 +116,121 @@ class TransactionViewSet(viewsets.ModelViewSet):
         'category': ['exact'],
     }
 
+    def get_timeseries_aggregates(self):
+        return {
+            "income": Sum('amount', filter=Q(transaction_type='income')),
+            "expense": Sum('amount', filter=Q(transaction_type='expense')),
+        }
+
+    def timeseries_net(self, bucket):
+        return bucket["income"] - bucket["expense"]
+
+    def get_totals(self, windows):
+        if self.use_rollups():
+            return rollup_totals(self.get_rollup_queryset(), windows)
+        return transaction_totals(self.get_queryset(), windows)
+
     @action(detail=False, methods=['get'])
     def filter_by_category(self, request):
-        category_id = request.query_params.get('category_id')
-        if category_id:
-            transactions = self.queryset.filter(category__id=category_id)
-        else:
-            transactions = self.queryset
+        # `category` is a choice key; `category_id` is still accepted from older clients.
+        category = request.query_params.get('category') or request.query_params.get('category_id')
+        transactions = self.get_queryset()
+        if category:
+            transactions = transactions.filter(category=category)
+
+        return self.list_response(transactions)
 
-        serializer = self.get_serializer(transactions, many=True)
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'])
+    @cached_aggregate
+    def by_category(self, request):
+        filters = {}
+        transaction_type = request.query_params.get('transaction_type')
+        if transaction_type:
+            filters["transaction_type"] = transaction_type
+        date_from = date_bound(request.query_params, 'date_from')
+        date_to = date_bound(request.query_params, 'date_to')
+        transactions = self.get_queryset().filter(date_window('date', date_from, date_to), **filters)
+
+        top = request.query_params.get('top')
+        try:
+            top = int(top) if top else None
+        except ValueError:
+            raise ValidationError({"top": "Must be an integer."})
+        return Response(category_breakdown(transactions, top))
     
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def statement_import(self, request):
+        """
+        Import a CSV or OFX bank statement uploaded as ``file``; ``format`` overrides the file
+        extension. Rows already on the ledger are skipped. Returns the import report.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({"file": "Upload a CSV or OFX statement."})
+        try:
+            report = import_statement(
+                upload, statement_format(upload.name, request.data.get('format')), self.get_owner(),
+                context=self.get_serializer_context(),
+            )
+        except StatementError as exc:
+            raise ValidationError({"file": str(exc)})
+        return Response(report.as_dict(), status=201 if report.inserted else 200)
+
+    @action(detail=False, methods=['get'], keyset_ordering='date')
+    def ledger(self, request):
+        """
+        Transactions oldest first, each with the account ``balance`` after it, like a bank
+        statement. ``date_from``/``date_to`` narrow the rows, not the balances. Pages also
+        carry their ``opening_balance`` and ``closing_balance``.
+        """
+        date_from = date_bound(request.query_params, 'date_from')
+        date_to = date_bound(request.query_params, 'date_to')
+        queryset = self.get_queryset().filter(date_window('date', date_from, date_to))
+        fast = self.get_fast_list_serializer()
+        if fast is not None:
+            queryset = fast.prepare(queryset)
+
+        paginator = self.paginator
+        page_queryset = paginator.get_page_queryset(queryset, request, self)
+        # The window runs in the page query's own order, so it starts at the cursor: forward
+        # pages sum from their first row, previous-page requests from their last row back.
+        backward = paginator.descending != paginator.reverse
+        order = [F('date').desc(), F('id').desc()] if backward else [F('date').asc(), F('id').asc()]
+        page_queryset = page_queryset.annotate(
+            signed=signed_amount(),
+            running=Window(Sum(signed_amount()), order_by=order, frame=RowRange(start=None, end=0)),
+        )
+        page = paginator.set_page(list(page_queryset))
+        rows = page if fast is not None else [vars(instance) for instance in page]
+
+        rollups = self.get_rollup_queryset() if self.use_rollups() else None
+        if rows:
+            opening = opening_balance(self.get_queryset(), rows[0]['date'], rows[0]['id'], rollups)
+        elif paginator.cursor:
+            cursor = paginator.cursor
+            opening = opening_balance(self.get_queryset(), cursor['value'], cursor['id'], rollups,
+                                      inclusive=not cursor['reverse'])
+        else:
+            opening = opening_balance(self.get_queryset(), date_from, 0, rollups)
+
+        with timed('serialize'):
+            data = fast.serialize(page) if fast is not None else self.get_serializer(page, many=True).data
+        for item, row in zip(data, rows):
+            if backward:
+                item['balance'] = opening + rows[0]['running'] - row['running'] + row['signed']
+            else:
+                item['balance'] = opening + row['running']
+        closing = data[-1]['balance'] if data else opening
+
+        response = paginator.get_paginated_data(data)
+        response.update(opening_balance=opening, closing_balance=closing)
+        return Response(response)
+
     @action(detail=False, methods=['get'])
     def todays_transactions(self, request):
         local_today = localtime(timezone.now()).date()
-        transactions = self.queryset.filter(date=local_today)
-        serializer = self.get_serializer(transactions, many=True)
-        return Response(serializer.data)
+        transactions = self.get_queryset().filter(date=local_today)
+        return self.list_response(transactions)
     
     @action(detail=False, methods=['get'])
     def filter_by_transaction_type(self, request):
@@ -119,162 +248,160 @@ class TransactionViewSet(viewsets.ModelViewSet):
         elif date_to:
             filters["date__lte"] = date_to
 
-        transactions = self.queryset.filter(**filters) if filters else self.queryset
+        transactions = self.get_queryset().filter(**filters)
 
-        serializer = self.get_serializer(transactions, many=True)
-        return Response(serializer.data)
+        return self.list_response(transactions)
     
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def today_total_transactions(self, request):
-        today_param = request.query_params.get("today")
-        if today_param:
-            try:
-                today = parse_date(today_param)
-            except ValueError:
-                today = localtime(timezone.now()).date()
-        else:
-            today = localtime(timezone.now()).date()
-
-        transactions = self.get_queryset().filter(date=today)
-        total_income = transactions.filter(transaction_type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        balance = total_income - total_expense
-
-        return Response({
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "balance": balance,
-        })
+        local_today = localtime(timezone.now()).date()
+        today = day_param(request.query_params.get("today"), local_today)
+        totals = self.get_totals({"today": (today, today)})
+        return Response(totals["today"])
 
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def yesterday_total_transactions(self, request):
         yesterday = (localtime(timezone.now()) - timedelta(days=1)).date()
-        transactions = self.get_queryset().filter(date=yesterday)
-        total_income = transactions.filter(transaction_type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        balance = total_income - total_expense
-
-        return Response({
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "balance": balance,
-        })
+        totals = self.get_totals({"yesterday": (yesterday, yesterday)})
+        return Response(totals["yesterday"])
 
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def summary(self, request):
         local_today = localtime(timezone.now()).date()
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
-        filters = {}
-
-        if date_from and date_to:
-            filters["date__range"] = [date_from, date_to]
-        elif date_from:
-            filters["date__gte"] = date_from
-        elif date_to:
-            filters["date__lte"] = date_to
+        # Extra windows requested with ?include=today,yesterday share the same query.
+        totals = self.get_totals(summary_windows(request.query_params, local_today))
+        return Response(summary_response(totals))
 
-        transactions = self.queryset
-        total_income = transactions.filter(transaction_type='income', **filters).aggregate(Sum('amount'))['amount__sum'] if filters else self.queryset.filter(transaction_type='income',
-            date__lte=local_today).aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = transactions.filter(transaction_type='expense', **filters).aggregate(Sum('amount'))['amount__sum'] if filters else self.queryset.filter(transaction_type='expense', 
-            date__lte=local_today).aggregate(Sum('amount'))['amount__sum'] or 0
-        balance = total_income - total_expense
-
-        return Response({
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "balance": balance,
-        })
-
-class CalendarEventViewSet(viewsets.ModelViewSet):
+class CalendarEventViewSet(AtomicWritesMixin, OwnerScopedMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     queryset = CalendarEvent.objects.all()
     serializer_class = CalendarEventSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = '-start_date'
 
     @action(detail=False, methods=['get'])
     def todays_events(self, request):
         local_today = localtime(timezone.now()).date()
-        events = self.queryset.filter(start_date__date=local_today)
-        serializer = self.get_serializer(events, many=True)
-        return Response(serializer.data)
+        events = self.get_queryset().filter(overlapping(*day_span(local_today)))
+        return self.list_response(events)
 
-    def get_queryset(self):
-        user = self.request.user
-        return self.queryset.filter(user=user)
+    @action(detail=False, methods=['get'], url_path='range', keyset_ordering='start_date')
+    def range(self, request):
+        """
+        Events overlapping ``[from, to)``, earliest first; ``from`` and ``to`` are dates or
+        datetimes in local time. Month and week views load with one indexed query per page.
+        """
+        start = local_bound(request.query_params.get('from'))
+        end = local_bound(request.query_params.get('to'))
+        errors = {}
+        for name, bound in (('from', start), ('to', end)):
+            if bound is None:
+                errors[name] = "Required; use YYYY-MM-DD or an ISO 8601 datetime."
+        if not errors and end <= start:
+            errors['to'] = "Must be after 'from'."
+        if errors:
+            raise ValidationError(errors)
+        return self.list_response(self.get_queryset().filter(overlapping(start, end)))
     
-class PettyCashViewSet(viewsets.ModelViewSet):
+class PettyCashViewSet(AtomicWritesMixin, OwnerScopedMixin, BulkMixin, ExportMixin, PaginatedActionMixin, RollupTotalsMixin, viewsets.ModelViewSet):
     queryset = PettyCash.objects.all()
     serializer_class = PettyCashSerializer
     permission_classes = [IsAuthenticated]
+    rollup_source = 'petty_cash'
+    keyset_ordering = '-date'
+
+    def perform_bulk_create(self, instances):
+        # bulk_create skips the pre_save hook that assigns control numbers.
+        missing = [instance for instance in instances if not instance.control_number]
+        for instance, control_number in zip(missing, allocate_control_numbers(len(missing))):
+            instance.control_number = control_number
+        return super().perform_bulk_create(instances)
 
     @action(detail=False, methods=['get'])
     def todays_petty_cash(self, request):
         local_today = localtime(timezone.now()).date()
-        petty_cash = self.queryset.filter(date=local_today)
-        serializer = self.get_serializer(petty_cash, many=True)
-        return Response(serializer.data)
+        petty_cash = self.get_queryset().filter(date=local_today)
+        return self.list_response(petty_cash)
     
     @action(detail=False, methods=['get'])
     def pending_petty_cash(self, request):
-        pending_petty_cash = self.queryset.filter(isApproved=False)
-        serializer = self.get_serializer(pending_petty_cash, many=True)
-        return Response(serializer.data)
+        pending_petty_cash = self.get_queryset().filter(isApproved=False)
+        return self.list_response(pending_petty_cash)
     
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def total_petty_cash(self, request):
-        approved_petty_cash = self.queryset.filter(isApproved=True)
-        total_petty_cash = approved_petty_cash.aggregate(Sum('amount'))['amount__sum'] or 0
+        total_petty_cash = self.total_amount({"isApproved": True}, {"kind": 'approved'})
         return Response({"total_petty_cash": total_petty_cash})
     
-class BillViewSet(viewsets.ModelViewSet):
+class BillViewSet(AtomicWritesMixin, OwnerScopedMixin, TimeseriesMixin, BulkMixin, ExportMixin, PaginatedActionMixin, RollupTotalsMixin, viewsets.ModelViewSet):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
     permission_classes = [IsAuthenticated]
+    rollup_source = 'bill'
+    keyset_ordering = '-due_date'
+    timeseries_date_field = 'due_date'
+
+    def get_timeseries_aggregates(self):
+        return {
+            "total": Sum('amount'),
+            "paid": Sum('amount', filter=Q(is_paid=True)),
+            "unpaid": Sum('amount', filter=Q(is_paid=False)),
+        }
 
     @action(detail=False, methods=['get'])
     def todays_bills(self, request):
         local_today = localtime(timezone.now()).date()
-        bills = self.queryset.filter(due_date=local_today)
-        serializer = self.get_serializer(bills, many=True)
-        return Response(serializer.data)
+        bills = self.get_queryset().filter(due_date=local_today)
+        return self.list_response(bills)
     
     @action(detail=False, methods=['get'])
     def pending_bills(self, request):
-        pending_bills = self.queryset.filter(is_paid=False)
-        serializer = self.get_serializer(pending_bills, many=True)
-        return Response(serializer.data)
+        pending_bills = self.get_queryset().filter(is_paid=False)
+        return self.list_response(pending_bills)
     
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def total_paid_bills(self, request):
-        paid_bills = self.queryset.filter(is_paid=True)
-        total_paid_bills = paid_bills.aggregate(Sum('amount'))['amount__sum'] or 0
+        total_paid_bills = self.total_amount({"is_paid": True}, {"kind": 'paid'})
         return Response({"total_paid_bills": total_paid_bills})
     
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def total_unpaid_bills(self, request):
-        unpaid_bills = self.queryset.filter(is_paid=False)
-        total_unpaid_bills = unpaid_bills.aggregate(Sum('amount'))['amount__sum'] or 0
+        total_unpaid_bills = self.total_amount({"is_paid": False}, {"kind": 'unpaid'})
         return Response({"total_unpaid_bills": total_unpaid_bills})
     
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def total_bills(self, request):
-        total_bills = self.queryset.aggregate(Sum('amount'))['amount__sum'] or 0
+        total_bills = self.total_amount()
         return Response({"total_bills": total_bills})
     
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(AtomicWritesMixin, OwnerScopedMixin, TimeseriesMixin, BulkMixin, ExportMixin, PaginatedActionMixin, RollupTotalsMixin, viewsets.ModelViewSet):
     queryset = Sale.objects.all()
     serializer_class = SaleSerializer
     permission_classes = [IsAuthenticated]
+    rollup_source = 'sale'
+    keyset_ordering = '-sale_date'
+    timeseries_date_field = 'sale_date'
 
     @action(detail=False, methods=['get'])
     def todays_sales(self, request):
         local_today = localtime(timezone.now()).date()
-        sales = self.queryset.filter(sale_date=local_today)
-        serializer = self.get_serializer(sales, many=True)
-        return Response(serializer.data)
+        sales = self.get_queryset().filter(sale_date=local_today)
+        return self.list_response(sales)
     
     @action(detail=False, methods=['get'])
+    @cached_aggregate
     def total_sales(self, request):
-        total_sales = self.queryset.aggregate(Sum('amount'))['amount__sum'] or 0
-        return Response({"total_sales": total_sales})
\ No newline at end of file
+        total_sales = self.total_amount()
+        return Response({"total_sales": total_sales})
+
+class RecurrenceRuleViewSet(AtomicWritesMixin, OwnerScopedMixin, PaginatedActionMixin, viewsets.ModelViewSet):
+    # Occurrences are written by `manage.py materialize_recurrences`.
+    queryset = RecurrenceRule.objects.all()
+    serializer_class = RecurrenceRuleSerializer
+    permission_classes = [IsAuthenticated]
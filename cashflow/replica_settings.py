@@ -0,0 +1,16 @@
+"""
+Read-replica stand-in for offline checks: ``db.sqlite3`` is the primary and
+``db-replica.sqlite3`` a replica refreshed by copying the primary, e.g. with
+``manage.py check_replica_routing --sync``.
+
+    DJANGO_SETTINGS_MODULE=cashflow.replica_settings python manage.py check_replica_routing --user 1 --sync
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': BASE_DIR / 'db-replica.sqlite3',
+    # Test runs read the primary's test database instead of creating an empty one.
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = ['replica']
@@ -52,6 +52,8 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.metrics.RequestMetricsMiddleware',
+    'api.db.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -86,9 +88,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reuse a worker's connection across requests so SQLITE_PRAGMAS run once per connection
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock at BEGIN: a deferred transaction that reads and then writes
+            # fails with "database is locked" at once instead of waiting out busy_timeout.
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # A file rather than SQLite's shared-cache memory database, so the concurrency tests
+        # in api/tests.py get the same locking, WAL and busy_timeout as a deployment.
+        'TEST': {
+            'NAME': BASE_DIR / 'test-db.sqlite3',
+        },
     }
 }
 
+# Aliases in DATABASES that serve reads for safe-method requests (see api.db); empty keeps every
+# query on 'default'. cashflow/replica_settings.py sets up two local SQLite files as a stand-in.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['api.db.ReplicaRouter']
+# After a write, the client's reads stay on 'default' this long so it sees its own changes
+REPLICA_PIN_SECONDS = 5
+
+# Applied to each new SQLite connection (api.db.configure_sqlite); `manage.py stress_sqlite`
+# compares them with SQLite's defaults. Set to {} to leave SQLite's defaults in place.
+SQLITE_PRAGMAS = {
+    # Readers don't block the writer and the writer doesn't block readers
+    'journal_mode': 'WAL',
+    # Durable at checkpoints; safe against corruption in WAL mode
+    'synchronous': 'NORMAL',
+    # Milliseconds to wait for a lock before raising "database is locked"
+    'busy_timeout': 20000,
+    # Page cache in KiB when negative (64 MiB) and memory-mapped reads up to 256 MiB
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,16 +176,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'api.authentication.CookieJWTAuthentication',
+        'api.authentication.CachedCookieJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # orjson-backed when installed; same output through the stdlib otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    # Upper bound for ?page_size= on paginated endpoints
+    'MAX_PAGE_SIZE': 1000,
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated',
     # ],
 }
 
+# Serve totals endpoints from the DailyRollup table (see `manage.py rebuild_rollups`)
+LEDGER_ROLLUPS_ENABLED = True
+
+# Largest list accepted by the `bulk` actions
+BULK_MAX_ITEMS = 500
+
+# Locmem is per process; point this at a file, database or shared cache backend
+# when running several workers so that invalidations reach all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cashflow',
+    }
+}
+
+# Cache used for the aggregate endpoints (summary, total_*) and its entry lifetime in seconds
+AGGREGATE_CACHE_ALIAS = 'default'
+AGGREGATE_CACHE_TIMEOUT = 300
+
+# Seconds a user row loaded for a token without user claims, and a user's is_active /
+# is_staff / is_superuser flags, are reused; saving the user drops both at once on
+# that worker and, with a shared cache backend, for the flags on every worker.
+# Also how often each worker reads newly blacklisted token ids (see api.authentication);
+# a token revoked on one worker is rejected by the others within that interval
+AUTH_USER_CACHE_TTL = 60
+AUTH_BLACKLIST_REFRESH_SECONDS = 5
+
+# Rows returned per list widget by /api/dashboard/ unless ?limit= is given
+DASHBOARD_LIST_LIMIT = 10
+
+# Render list responses from values() rows instead of ModelSerializer instances
+FAST_LIST_SERIALIZATION = True
+
+# Per-request query count and timings: Server-Timing header and /api/_metrics/
+REQUEST_METRICS_ENABLED = DEBUG
+# Append each request and its queries as JSON lines, for `manage.py metrics_offenders`
+REQUEST_METRICS_LOG = None
+
 
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOWED_ORIGINS = [
@@ -172,6 +261,7 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": False,
+    "TOKEN_REFRESH_SERIALIZER": "api.authentication.CachedTokenRefreshSerializer",
 
     # "ALGORITHM": "HS256",
     # "SIGNING_KEY": SECRET_KEY,